@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Benchmark: listing-page parse time, redfin_parser.parse_listing vs the previous
+process_property parse (repeated extract_between scans plus a BeautifulSoup pass
+over every <script> for the JSON-LD price). Also checks both produce the same record.
+
+Corpus: a directory of saved listing pages, either *.html or bronze-style
+*.html.gz (zlib, as written by upload_bronze_html). Without one, --synthetic N
+generates pages with the markers the parsers look for.
+Run from the project root: python app/Redfin/bench_parser.py [corpus_dir] [--synthetic N]
+"""
+import argparse
+import gzip
+import json
+import random
+import re
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+import redfin_parser
+from redfin_parser import extract_between, find_genmid_values, money_to_int, parse_date, safe_float
+
+DEFAULT_CORPUS = Path("app/Redfin/Output/pages")
+REPEATS = 5
+
+property_type_re = re.compile(r'"propertyType"\s*:\s*"([^"]+)"')
+
+
+# ---------------- Baseline (pre-extractor process_property parse) ---------
+
+def legacy_sale_history(html, url):
+    start_marker = r'\"events\":[{'
+    start_idx = html.find(start_marker)
+    if start_idx == -1:
+        start_marker = r'"events":[{'
+        start_idx = html.find(start_marker)
+    if start_idx == -1:
+        return []
+    array_start_idx = start_idx + len(start_marker) - 2
+    unescaped = html[array_start_idx : array_start_idx + 25000].replace(r'\"', '"').replace(r'\\', '\\')
+    try:
+        events_list, _ = json.JSONDecoder().raw_decode(unescaped)
+    except json.JSONDecodeError:
+        return []
+    rows = []
+    for e in events_list:
+        ts = e.get("eventDate")
+        date_str = datetime.fromtimestamp(ts / 1000).strftime("%b %d, %Y") if isinstance(ts, int) else ""
+        rows.append({"url": url, "eventDate": date_str, "eventType": e.get("eventDescription", ""),
+                     "price": str(e.get("price", "")), "MLS": e.get("sourceId", "")})
+    return rows
+
+def legacy_price_from_json(html):
+    soup = BeautifulSoup(html, "lxml")
+    for script in soup.find_all("script"):
+        if not script.string:
+            continue
+        try:
+            stack = [json.loads(script.string)]
+            while stack:
+                curr = stack.pop()
+                if isinstance(curr, dict):
+                    if "price" in curr and "priceCurrency" in curr:
+                        return int(curr["price"])
+                    if "offers" in curr:
+                        stack.append(curr["offers"])
+                    stack.extend(v for v in curr.values() if isinstance(v, (dict, list)))
+                elif isinstance(curr, list):
+                    stack.extend(item for item in curr if isinstance(item, (dict, list)))
+        except Exception:
+            continue
+    return None
+
+def legacy_parse(html, url):
+    mls = extract_between(html, "TREB #", "<")
+    if not mls or mls == "N/A":
+        mls = redfin_parser.listing_mls(html, url)
+    history = legacy_sale_history(html, url)
+    history.sort(key=lambda h: parse_date(h["eventDate"]) or datetime.min)
+    sold_evts = [h for h in history if "sold" in h["eventType"].lower()]
+    sold_evt = sold_evts[-1] if sold_evts else None
+    listed_evts = [h for h in history if "listed" in h["eventType"].lower() and "delisted" not in h["eventType"].lower()]
+    first_listed_evt = listed_evts[0] if listed_evts else None
+    sold_price = money_to_int(sold_evt["price"]) if sold_evt else None
+    if not sold_price:
+        sold_price = legacy_price_from_json(html) or sold_price
+    first_list_price = money_to_int(first_listed_evt["price"]) if first_listed_evt else None
+    days_on_market = sold_price_diff = None
+    if sold_evt and first_listed_evt:
+        d_sold, d_listed = parse_date(sold_evt["eventDate"]), parse_date(first_listed_evt["eventDate"])
+        if d_sold and d_listed:
+            days_on_market = (d_sold - d_listed).days
+    if sold_price and first_list_price:
+        sold_price_diff = sold_price - first_list_price
+    image_filenames = find_genmid_values(html)
+    match = property_type_re.search(html)
+    if match:
+        property_type = match.group(1).title()
+    else:
+        property_type = extract_between(html, 'Property Type","content":"', "\\")
+        property_type = None if property_type == "N/A" else property_type
+    return {
+        "url": url, "MLS": mls, "Sold Price": sold_price,
+        "Number Beds": safe_float(extract_between(html, '"latestListingInfo":{"beds":', ",")),
+        "Number Baths": safe_float(extract_between(html, '"baths":', ",")),
+        "Sold Date": sold_evt["eventDate"] if sold_evt else extract_between(html, '"lastSaleDate":"'),
+        "Address": extract_between(html, 'assembledAddress":"', "\\"),
+        "Postal Code": extract_between(html, '"postalCode":"', '"'),
+        "Property Type": property_type,
+        "latitude": safe_float(extract_between(html, 'latitude":', ",")),
+        "longitude": safe_float(extract_between(html, 'longitude":', "}")),
+        "First Listed Date": first_listed_evt["eventDate"] if first_listed_evt else None,
+        "Days On Market": days_on_market, "Sold Price Difference": sold_price_diff,
+        "photo_blob": f"images/{mls}_1.jpg" if image_filenames else None,
+    }
+
+
+# ---------------- Corpus --------------------------------------------------
+
+def read_page(path):
+    data = path.read_bytes()
+    if path.suffix == ".gz":
+        try:
+            data = zlib.decompress(data)
+        except zlib.error:
+            data = gzip.decompress(data)
+    return data.decode("utf-8", errors="replace")
+
+def load_corpus(corpus_dir):
+    paths = sorted(p for p in corpus_dir.glob("*") if p.name.endswith((".html", ".html.gz")))
+    return [(f"https://www.redfin.ca/on/ottawa/home/{p.name.split('.')[0]}", read_page(p)) for p in paths]
+
+def synthetic_page(i, rng, filler_kb=300):
+    """A listing-shaped page: filler scripts, an escaped JSON payload, JSON-LD and gallery images."""
+    day = 24 * 3600 * 1000
+    listed = 1_690_000_000_000 + rng.randrange(0, 300) * day
+    sold = listed + rng.randrange(5, 90) * day
+    events = [
+        {"eventDate": listed, "eventDescription": "Listed", "price": 600_000 + i, "sourceId": f"X{i}"},
+        {"eventDate": sold, "eventDescription": "Sold", "price": 640_000 + i, "sourceId": f"X{i}"},
+    ]
+    if i % 5 == 0:
+        events = [e for e in events if e["eventDescription"] != "Sold"]  # Forces the JSON-LD price path
+    payload = json.dumps({
+        "propertyId": i, "latestListingInfo": {"beds": 3, "baths": 2.5, "events": events},
+        "assembledAddress": f"{i} Bank St", "lastSaleDate": "Aug 02, 2024",
+    }, separators=(",", ":"))
+    pad = "x" * 900
+    filler = "".join(
+        f'<script>window.__chunk{k}=function(a){{return a+"{pad}"}};</script>' for k in range(filler_kb)
+    )
+    ld = json.dumps({
+        "@type": "Product", "propertyType": "single family residential",
+        "address": {"postalCode": "K1P 1A1"},
+        "geo": {"latitude": 45.4 + i / 1e5, "longitude": -75.7 - i / 1e5},
+        "offers": {"price": 650_000 + i, "priceCurrency": "CAD"},
+    }, separators=(",", ":"))
+    photos = "".join(f'<img src="https://ssl.cdn-redfin.com/photo/248/genMid.X{i}_{n}.jpg">' for n in range(8))
+    return (
+        f'<html><head><link rel="canonical" href="https://www.redfin.ca/on/ottawa/home/{i}">'
+        f'{filler}<script type="application/ld+json">{ld}</script></head><body>'
+        f'<div>TREB #X{i}</div>{photos}'
+        f'<script>root.__reactServerState.InitialContext = {json.dumps(payload)};</script></body></html>'
+    )
+
+
+# ---------------- Run -----------------------------------------------------
+
+def time_parser(fn, pages):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        for url, html in pages:
+            fn(html, url)
+    return (time.perf_counter() - start) / (REPEATS * len(pages)) * 1000
+
+def run(pages):
+    mismatches = sum(legacy_parse(html, url) != redfin_parser.parse_listing(html, url)[0] for url, html in pages)
+    avg_kb = sum(len(html) for _, html in pages) / len(pages) / 1024
+    legacy_ms = time_parser(legacy_parse, pages)
+    new_ms = time_parser(lambda html, url: redfin_parser.parse_listing(html, url), pages)
+    print(f"{len(pages)} pages, avg {avg_kb:.0f} KB, {mismatches} record mismatches")
+    print(f"{'parser':>14} {'ms/page':>9}")
+    print(f"{'legacy':>14} {legacy_ms:>9.2f}")
+    print(f"{'parse_listing':>14} {new_ms:>9.2f}  ({legacy_ms / new_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("corpus", nargs="?", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--synthetic", type=int, default=0, help="generate N synthetic pages instead")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        rng = random.Random(0)
+        pages = [(f"https://www.redfin.ca/on/ottawa/home/{i}", synthetic_page(i, rng)) for i in range(args.synthetic)]
+    else:
+        pages = load_corpus(args.corpus) if args.corpus.exists() else []
+    if not pages:
+        raise SystemExit(f"No pages in {args.corpus}; pass a corpus directory or --synthetic N")
+    run(pages)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Compacts silver part files into each month's listed_properties.parquet.
+Run from the project root: python app/Redfin/compact_silver.py [--month YYYY-MM] [--min-parts N]
+"""
+import argparse
+import os
+import time
+
+from azure.storage.blob import BlobServiceClient
+from dotenv import load_dotenv
+
+from silver_store import compact_month, list_months
+
+# ---------------- config --------------------------------------------------
+load_dotenv()
+
+CONN_STR = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+CONTAINER_NAME = "redfin-data"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact silver part files per month.")
+    parser.add_argument("--month", action="append", help="month to compact (YYYY-MM); repeatable, default all")
+    parser.add_argument("--min-parts", type=int, default=1, help="skip months with fewer part files")
+    args = parser.parse_args()
+
+    if not CONN_STR:
+        raise ValueError("Missing AZURE_STORAGE_CONNECTION_STRING in .env")
+    container = BlobServiceClient.from_connection_string(CONN_STR).get_container_client(CONTAINER_NAME)
+
+    start_time = time.time()
+    months = list_months(container)
+    for month in sorted(args.month or months):
+        part_count = months.get(month, 0)
+        if part_count < args.min_parts:
+            print(f"   {month}: {part_count} parts, skipping")
+            continue
+        rows, compacted = compact_month(container, month)
+        print(f"✅ {month}: folded {compacted} parts -> {rows} rows")
+    print(f"⏱️ Compaction took {time.time() - start_time:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,20 @@
 #!/usr/bin/env python3
 import os
+import re
 import json
 import time
-import random
-import io
-import pandas as pd
+import asyncio
+import itertools
 from pathlib import Path
-from playwright.sync_api import sync_playwright
+import pandas as pd
+from playwright.async_api import async_playwright
 from azure.storage.blob import BlobServiceClient
 from dotenv import load_dotenv
+from rate_limit import RateLimiter
+from readiness import RESULTS_SELECTOR, ReadyStats, scroll_lazy_cards, wait_ready_async
+from redfin_parser import card_record, parse_gis_homes, search_result_urls
+from silver_store import list_months, new_run_id, read_month, write_part
+from url_frontier import UrlFrontier, home_id
 
 # ---------------- Config --------------------------------------------------
 load_dotenv()
@@ -20,66 +26,73 @@ CONTAINER_NAME = "redfin-data"
 # Redfin Config
 # "Sold 3yr, Sort by Sale Date (High to Low)"
 START_URL = "https://www.redfin.ca/on/ottawa/filter/sort=hi-sale-date,include=sold-3yr"
-OUTPUT_FILE = Path("app/Redfin/Output/property_urls.txt")
 MAX_NEW_URLS = int(os.getenv("MAX_NEW_URLS", 500)) 
-WAIT_SEC = 2
+
+# Early stop: results are newest sale first, so once a run is past the listings that
+# topped the previous run's first page, a page with nothing new means the rest is known.
+# DISCOVERY_FULL=1 walks every page instead (backfills).
+HIGH_WATER_KEY = "discovery_high_water"
+HIGH_WATER_SIZE = 5  # Top home ids kept; any one of them marks the spot, in case some drop off
+DISCOVERY_FULL = os.getenv("DISCOVERY_FULL", "0") == "1"
+
+# Sharding: the search is split into independent filter URLs, crawled concurrently.
+# Each shard stays under the site's result-count cap, which one 3-year search does not.
+# DISCOVERY_SHARDS: "" (one search, the daily default), "type", "price" or "type,price".
+DISCOVERY_SHARDS = os.getenv("DISCOVERY_SHARDS", "")
+DISCOVERY_CONCURRENCY = int(os.getenv("DISCOVERY_CONCURRENCY", 3))
+DISCOVERY_RATE_PER_SEC = float(os.getenv("DISCOVERY_RATE_PER_SEC", 0.5))
+PROPERTY_TYPES = ["house", "condo", "townhouse", "multifamily", "land", "other"]
+PRICE_BANDS = [None, "300k", "450k", "600k", "750k", "1M", "1.5M", None]  # Edges; None = open
+
+# The results page's own search request; its JSON carries every card's fields
+GIS_PATH = "/stingray/api/gis"
+
+# Pre-frontier URL lists, imported once when the frontier is empty
+SEED_FILES = [
+    Path("app/Redfin/Output/property_urls.txt"),
+    Path("app/Redfin/Output/property_urls_duplicate.txt"),
+]
 
 # ---------------- Helpers -------------------------------------------------
 
-def get_latest_azure_urls():
-    """Fetches the LATEST parquet file from Azure and returns a set of known URLs."""
+def get_container_client():
+    if not AZURE_CONN_STR:
+        return None
+    return BlobServiceClient.from_connection_string(AZURE_CONN_STR).get_container_client(CONTAINER_NAME)
+
+def get_azure_urls():
+    """Every URL in silver, all months. Only used to seed an empty frontier."""
     if not AZURE_CONN_STR:
         print("⚠️ No AZURE_STORAGE_CONNECTION_STRING. Skipping Azure check.")
-        return set()
+        return []
 
     try:
-        blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONN_STR)
-        container_client = blob_service_client.get_container_client(CONTAINER_NAME)
-        
-        # Find latest parquet in silver/
-        blobs = container_client.list_blobs(name_starts_with="silver/")
-        latest_blob = None
-        latest_time = None
-        
-        for blob in blobs:
-            if blob.name.endswith("listed_properties.parquet"):
-                if latest_time is None or blob.last_modified > latest_time:
-                    latest_time = blob.last_modified
-                    latest_blob = blob.name
-                    
-        if latest_blob:
-            print(f"✅ Found latest Azure data: {latest_blob}")
-            blob_client = container_client.get_blob_client(latest_blob)
-            data = blob_client.download_blob().readall()
-            
-            df = pd.read_parquet(io.BytesIO(data))
-            if "url" in df.columns:
-                urls = set(df["url"].dropna().tolist())
-                print(f"ℹ️ Loaded {len(urls)} existing URLs from Azure.")
-                return urls
-            else:
-                print("⚠️ Azure parquet missing 'url' column.")
-                return set()
-        else:
-            print("ℹ️ No existing parquet files in Azure.")
-            return set()
-            
+        container_client = get_container_client()
+
+        urls = []
+        for month in sorted(list_months(container_client)):
+            df, _ = read_month(container_client, month, columns=["url"])
+            urls.extend(df["url"].dropna().tolist())
+        print(f"ℹ️ Loaded {len(urls)} existing URLs from Azure silver.")
+        return urls
+
     except Exception as e:
         print(f"❌ Error fetching Azure data: {e}")
-        return set()
+        return []
 
-def get_local_urls():
-    if not OUTPUT_FILE.exists():
-        return set()
-    with OUTPUT_FILE.open("r", encoding="utf-8") as f:
-        return set(line.strip() for line in f if line.strip())
+def read_url_file(path):
+    if not path.exists():
+        return []
+    with path.open("r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
 
-def save_urls(new_urls):
-    # Append to file
-    with OUTPUT_FILE.open("a", encoding="utf-8") as f:
-        for url in new_urls:
-            f.write(f"{url}\n")
-    print(f"✅ Saved {len(new_urls)} new URLs to {OUTPUT_FILE}")
+def seed_frontier(frontier):
+    """First run: silver URLs count as scraped, the old URL lists as still to scrape."""
+    scraped = frontier.add(get_azure_urls(), status="scraped")
+    discovered = []
+    for path in SEED_FILES:
+        discovered += frontier.add(read_url_file(path))
+    print(f"✅ Seeded frontier: {len(scraped)} scraped, {len(discovered)} to scrape")
 
 COOKIE_FILE = Path("app/Redfin/chrome_cookies.json")
 
@@ -95,179 +108,228 @@ def load_redfin_cookies():
         if ".redfin.ca" in c.get("domain", "")
     ]
 
+# ---------------- Shards --------------------------------------------------
+
+def price_filters(low, high):
+    return ",".join(f for f in (low and f"min-price={low}", high and f"max-price={high}") if f)
+
+def build_shards(spec):
+    """[(name, url)] covering the whole START_URL search once, split along the axes in `spec`."""
+    axes = {a.strip() for a in spec.split(",") if a.strip()}
+    unknown = axes - {"type", "price"}
+    if unknown:
+        raise ValueError(f"Unknown DISCOVERY_SHARDS axes: {sorted(unknown)}")
+    types = [(t, f"property-type={t}") for t in PROPERTY_TYPES] if "type" in axes else [("", "")]
+    bands = [
+        (f"{low or 0}-{high or 'up'}", price_filters(low, high)) for low, high in zip(PRICE_BANDS, PRICE_BANDS[1:])
+    ] if "price" in axes else [("", "")]
+    shards = []
+    for (type_name, type_filter), (band_name, band_filter) in itertools.product(types, bands):
+        name = "/".join(n for n in (type_name, band_name) if n) or "all"
+        filters = ",".join(f for f in (type_filter, band_filter) if f)
+        shards.append((name, f"{START_URL},{filters}" if filters else START_URL))
+    return shards
+
+def high_water_key(shard_name):
+    # The unsharded search keeps the original key, so switching modes never loses its mark
+    return HIGH_WATER_KEY if shard_name == "all" else f"{HIGH_WATER_KEY}:{shard_name}"
+
+def page_url(base, page_num):
+    return base if page_num == 1 else f"{base}/page-{page_num}"
+
 # ---------------- Main Logic ----------------------------------------------
 
-def main():
-    # 1. Load Ignore List
-    azure_urls = get_latest_azure_urls()
-    local_urls = get_local_urls()
-    
-    known_urls = azure_urls.union(local_urls)
-    print(f"ℹ️ Total known URLs to ignore: {len(known_urls)}")
-    
-    new_found = []
-    
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
+async def block_heavy(route):
+    # Optimization: Block heavy resources for faster loading
+    if route.request.resource_type in ["image", "media", "font"]:
+        await route.abort()
+    else:
+        await route.continue_()
+
+async def at_last_page(page):
+    next_button = page.locator("button[data-rf-test-id='react-data-paginate-next']").first
+    if await next_button.count() == 0:
+        next_button = page.locator(".step-next").first
+    if await next_button.count() == 0:
+        return False
+    classes = await next_button.get_attribute("class") or ""
+    return "disabled" in classes or not await next_button.is_enabled()
+
+def complete_cards(added, gis_bodies):
+    """Provisional silver rows for the newly added URLs whose search card has every field."""
+    cards = {}
+    for body in gis_bodies:
+        for home in parse_gis_homes(body):
+            record = card_record(home)
+            if record:
+                cards[home_id(record["url"])] = record
+    return [cards[hid] for hid in map(home_id, added) if hid in cards]
+
+async def crawl_shard(page, gis_bodies, shard, frontier, limiter, ready_stats, new_found, provisional):
+    """
+    Walks one shard's result pages (newest sale first) into the frontier until the
+    results end, MAX_NEW_URLS is reached across all shards, or the early stop fires.
+    New listings whose card is complete are also collected in `provisional`.
+    """
+    name, base = shard
+    high_water = set(frontier.get_meta(high_water_key(name), []))
+    new_high_water = []
+    passed_mark = reached_end = False
+
+    for page_num in itertools.count(1):
+        if len(new_found) >= MAX_NEW_URLS:
+            print(f"🛑 [{name}] Reached MAX_NEW_URLS limit.")
+            break
+        url = page_url(base, page_num)
+        await limiter.wait()
+        gis_bodies.clear()
+        try:
+            await page.goto(url, wait_until="domcontentloaded", timeout=45000)
+
+            # Wait for the listing card links instead of a fixed delay
+            elapsed = await wait_ready_async(page, selector=RESULTS_SELECTOR)
+            ready_stats.record(elapsed)
+
+            # Check for "No Results"
+            if await page.locator("text=No results found").count() > 0:
+                print(f"   [{name}] page {page_num}: no results.")
+                reached_end = True
+                break
+
+            # Pull in cards that only load on scroll before reading the links
+            await scroll_lazy_cards(page)
+
+            # One round trip for the whole page; links are parsed in Python
+            page_urls = search_result_urls(await page.content())
+            if not page_urls:
+                # Debug Screenshot; also dump the title to see if we are blocked
+                debug_path = Path(f"app/Redfin/Output/debug_{re.sub(r'[^a-z0-9]+', '_', name)}_{page_num}.png")
+                await page.screenshot(path=str(debug_path))
+                print(f"   ⚠️ [{name}] page {page_num}: 0 links (title {await page.title()!r}), screenshot {debug_path}")
+                break
+
+            # Dedupe by home id; new ones are saved immediately
+            added = frontier.add(page_urls)
+            new_found.extend(added)
+            carded = complete_cards(added, gis_bodies)
+            provisional.extend(carded)
+            page_ids = list(dict.fromkeys(filter(None, map(home_id, page_urls))))
+            print(f"   [{name}] page {page_num}: {len(page_ids)} listings, +{len(added)} new "
+                  f"({len(carded)} from cards) (Total New: {len(new_found)})")
+
+            if not new_high_water:
+                new_high_water = page_ids[:HIGH_WATER_SIZE]
+            passed_mark = passed_mark or bool(high_water.intersection(page_ids))
+            if passed_mark and not added and not DISCOVERY_FULL:
+                print(f"🛑 [{name}] Past last run's high-water mark and nothing new on this page. Stopping.")
+                break
+
+            if await at_last_page(page):
+                print(f"   [{name}] End of results.")
+                reached_end = True
+                break
+        except Exception as e:
+            # Abort the shard rather than loop on a broken page; others carry on
+            print(f"❌ [{name}] Error on page {page_num}: {e}")
+            break
+
+    # Only move the mark once everything newer than the old one has been walked;
+    # otherwise the gap left by an aborted run would be skipped next time
+    if new_high_water and (passed_mark or reached_end):
+        frontier.set_meta(high_water_key(name), new_high_water)
+
+async def discovery_worker(context, shards, frontier, limiter, ready_stats, new_found, provisional):
+    """One tab, reused for every shard it takes from the queue."""
+    page = await context.new_page()
+    await page.route("**/*", block_heavy)
+
+    # Keep the search JSON the page fetches for itself
+    gis_bodies = []
+    async def capture_gis(response):
+        if GIS_PATH in response.url and response.ok:
+            try:
+                gis_bodies.append(await response.text())
+            except Exception:
+                pass
+    page.on("response", capture_gis)
+    try:
+        while True:
+            try:
+                shard = shards.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await crawl_shard(page, gis_bodies, shard, frontier, limiter, ready_stats, new_found, provisional)
+    finally:
+        await page.close()
+
+async def discover(shards, frontier):
+    """Crawls `shards` with DISCOVERY_CONCURRENCY tabs; every request shares one rate limit."""
+    queue = asyncio.Queue()
+    for shard in shards:
+        queue.put_nowait(shard)
+    limiter = RateLimiter(DISCOVERY_RATE_PER_SEC)
+    ready_stats = ReadyStats("Results pages")
+    new_found, provisional = [], []
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
         # Use a realistic user agent
-        context = browser.new_context(
+        context = await browser.new_context(
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
             viewport={"width": 1280, "height": 800}
         )
-        
+
         # Load Cookies
         cookies = load_redfin_cookies()
         if cookies:
-            context.add_cookies(cookies)
+            await context.add_cookies(cookies)
             print(f"ℹ️ Loaded {len(cookies)} cookies.")
-            
-        page = context.new_page()
-        
-        # Optimization: Block heavy resources for faster loading
-        def block_heavy(route):
-            if route.request.resource_type in ["image", "media", "font"]:
-                route.abort()
-            else:
-                route.continue_()
-        page.route("**/*", block_heavy)
-
-        current_url = START_URL
-        page_num = 1
-        
-        while len(new_found) < MAX_NEW_URLS:
-            print(f"\n--- Scraping Page {page_num} ---")
-            print(f"URL: {current_url}")
-            
-            try:
-                page.goto(current_url, wait_until="domcontentloaded", timeout=45000)
-                time.sleep(WAIT_SEC)
-                
-                # Scroll to trigger lazy loads
-                for _ in range(3):
-                    page.mouse.wheel(0, 1000)
-                    time.sleep(0.5)
-                
-                # Check for "No Results"
-                if page.locator("text=No results found").count() > 0:
-                     print("   -> No results found.")
-                     break
-
-                # Scrape Links
-                links = page.locator("a[href*='/home/']").all()
-                print(f"   [DEBUG] Found {len(links)} raw links on page.")
-                
-                if len(links) == 0:
-                    # Debug Screenshot
-                    debug_path = Path(f"app/Redfin/Output/debug_page_{page_num}.png")
-                    page.screenshot(path=str(debug_path))
-                    print(f"   ⚠️ Found 0 links. Saved screenshot to {debug_path}")
-                    
-                    # Also dump HTML title to see if we are blocked
-                    print(f"   [DEBUG] Page Title: {page.title()}")
-
-                count_before = len(new_found)
-                
-                for link in links:
-                    href = link.get_attribute("href")
-                    if not href: continue
-                    
-                    full_url = f"https://www.redfin.ca{href}" if href.startswith("/") else href
-                    
-                    # Dedupe
-                    if full_url not in known_urls and full_url not in new_found:
-                        new_found.append(full_url)
-                        known_urls.add(full_url) 
-                
-                added = len(new_found) - count_before
-                print(f"   + Added {added} new properties (Total New: {len(new_found)})")
-                
-                if len(new_found) >= MAX_NEW_URLS:
-                    print("🛑 Reached MAX_NEW_URLS limit.")
-                    break
-
-                # Pagination Logic
-                # Try clicking next button
-                # Selectors used by Redfin:
-                # 1. data-rf-test-id='react-data-paginate-next'
-                # 2. button with class containing 'step-next'
-                # 3. a or button with aria-label='Next Page'
-                next_button = page.locator("button[data-rf-test-id='react-data-paginate-next']").first
-                if next_button.count() == 0:
-                    next_button = page.locator(".step-next").first
-                
-                if next_button.count() > 0 and next_button.is_enabled():
-                     # Double check if disabled via class
-                    classes = next_button.get_attribute("class") or ""
-                    if "disabled" in classes:
-                        print("   -> Next button disabled (class). End of results.")
-                        break
-                    
-                    next_button.click()
-                    print(f"   -> Clicked 'Next'. Waiting...")
-                    page_num += 1
-                    # Update current_url for logging purposes, though click handles nav
-                    # We accept we might drift from 'current_url' variable if we rely solely on click
-                    # But better to sync it if possible.
-                    # Actually, if we click, we should just let the loop continue.
-                    # But we need to update page_num for the log.
-                    
-                else:
-                    print("   -> 'Next' button not found or not detectable. Attempting manual URL navigation...")
-                    
-                    # Manual Fallback: Construct next page URL
-                    page_num += 1
-                    
-                    # Redfin pagination URL structure:
-                    # Base: .../filter/...
-                    # Page 2: .../filter/.../page-2
-                    if "/page-" in current_url:
-                        import re
-                        current_url = re.sub(r'/page-\d+', f'/page-{page_num}', current_url)
-                    else:
-                        current_url = f"{current_url}/page-{page_num}"
-                        
-                    print(f"   -> Forcing navigation to Page {page_num}: {current_url}")
-                    # Force goto in next iteration via loop variable update? 
-                    # The loop uses 'current_url' at start, so updating it here works IF we don't click.
-                    # Since we didn't click, we just loop around and page.goto(current_url) happens.
-                    continue
-                    
-                # If we clicked, we need to wait for nav or update current_url for the next loop's goto?
-                # The loop structure:
-                # while...
-                #    page.goto(current_url) ...
-                # 
-                # If we click 'Next', the page navigates. 
-                # On next loop iteration, page.goto(current_url) will reload the OLD url unless we update 'current_url' to the new one.
-                # Redfin changes URL on click.
-                
-                # Wait for URL to change if we clicked
-                try:
-                    page.wait_for_url(lambda u: str(page_num) in u or f"page-{page_num}" in u, timeout=5000)
-                    current_url = page.url
-                    print(f"   -> Navigation successful. New URL: {current_url}")
-                except:
-                    # If wait fails, maybe we just assume it worked or fallback to manual
-                    print("   -> URL didn't change after click (or timeout). Forcing manual URL update.")
-                    if "/page-" in current_url:
-                        import re
-                        current_url = re.sub(r'/page-\d+', f'/page-{page_num}', current_url)
-                    else:
-                        current_url = f"{current_url}/page-{page_num}"
-                    
-            except Exception as e:
-                print(f"❌ Error on page {page_num}: {e}")
-                # Try to skip to next page anyway if error was temporary? 
-                # Or abort? Abort seems safer to avoid infinite loops.
-                break
-        
-        browser.close()
 
-    # Save results
+        workers = min(DISCOVERY_CONCURRENCY, len(shards)) or 1
+        await asyncio.gather(*(
+            discovery_worker(context, queue, frontier, limiter, ready_stats, new_found, provisional)
+            for _ in range(workers)
+        ))
+        await browser.close()
+    print(ready_stats.summary())
+    return new_found, provisional
+
+def save_provisional(frontier, records):
+    """
+    Card rows go to silver as their own part; the detail scrape's later part wins per MLS.
+    Only once they are stored are the homes marked carded, which moves them behind
+    listings that have no silver row yet.
+    """
+    container_client = get_container_client()
+    if container_client is None:
+        print(f"⚠️ No AZURE_STORAGE_CONNECTION_STRING. {len(records)} card rows not saved.")
+        return
+    blob_name = write_part(container_client, pd.DataFrame(records), run_id=new_run_id("cards"))
+    frontier.mark_carded(*(r["url"] for r in records))
+    print(f"✅ Saved {len(records)} provisional rows from search cards to {blob_name}")
+
+def main():
+    start_time = time.time()
+
+    # 1. Known listings live in the frontier; a new link is one that adds a home id
+    frontier = UrlFrontier()
+    if not len(frontier):
+        seed_frontier(frontier)
+    print(f"ℹ️ Frontier: {frontier.counts()}")
+
+    shards = build_shards(DISCOVERY_SHARDS)
+    print(f"🚀 Discovering over {len(shards)} shard(s) with {DISCOVERY_CONCURRENCY} tabs "
+          f"at {DISCOVERY_RATE_PER_SEC:g} req/s{' (full walk)' if DISCOVERY_FULL else ''}...")
+    new_found, provisional = asyncio.run(discover(shards, frontier))
+    if provisional:
+        save_provisional(frontier, provisional)
+
     if new_found:
-        save_urls(new_found)
+        print(f"✅ Added {len(new_found)} new URLs to the frontier")
     else:
         print("\n⚠️ No new URLs found in this run.")
+    frontier.close()
+    print(f"⏱️ Discovery took {time.time() - start_time:.1f}s")
 
 if __name__ == "__main__":
     main()
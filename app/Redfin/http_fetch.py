@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+HTTP-first page fetch for the Redfin scrapers. The markers our parsers look for
+are in the server-rendered HTML, so a pooled keep-alive session usually gets
+everything without a browser. Callers fall back to Playwright when the
+response is a WAF challenge or the markers are missing.
+"""
+import os
+from collections import Counter
+import requests
+from requests.adapters import HTTPAdapter
+
+# auto = HTTP first with browser fallback, http = never open a page, browser = always
+FETCH_MODE = os.getenv("FETCH_MODE", "auto")
+HTTP_TIMEOUT_SEC = 20
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"
+
+# Status codes and body snippets that mean a bot wall rather than a listing
+CHALLENGE_STATUS = {403, 405, 429, 503}
+CHALLENGE_SNIPPETS = ("captcha", "px-captcha", "cf-challenge", "Access Denied", "Request unsuccessful")
+
+
+def make_session(cookies, pool_size=4):
+    """Keep-alive session carrying the Playwright-format cookies from load_redfin_cookies()."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "User-Agent": USER_AGENT,
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": "en-CA,en;q=0.9",
+        "Accept-Encoding": "gzip, deflate",
+    })
+    for c in cookies:
+        session.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c.get("path", "/"))
+    return session
+
+
+def has_markers(html, markers):
+    """Python twin of the readiness check: every group has at least one alternative in `html`."""
+    return all(any(m in html for m in alts) for alts in markers)
+
+
+def is_challenge(resp):
+    if resp.status_code in CHALLENGE_STATUS or "/login" in resp.url:
+        return True
+    head = resp.text[:5000]
+    return any(s in head for s in CHALLENGE_SNIPPETS)
+
+
+def fetch_html(session, url, markers):
+    """
+    Fetches `url` over plain HTTP. Returns (html, None) when usable, else
+    (None, reason) where reason says why the caller should use a browser.
+    """
+    try:
+        resp = session.get(url, timeout=HTTP_TIMEOUT_SEC)
+    except requests.RequestException as e:
+        return None, f"error: {type(e).__name__}"
+    if is_challenge(resp):
+        return None, "challenge"
+    if resp.status_code != 200:
+        return None, f"status {resp.status_code}"
+    if not has_markers(resp.text, markers):
+        return None, "missing markers"
+    return resp.text, None
+
+
+class FetchStats:
+    """Counts which path served each page, and why the browser was needed."""
+
+    def __init__(self):
+        self.paths = Counter()
+        self.fallbacks = Counter()
+
+    def record(self, path, reason=None):
+        self.paths[path] += 1
+        if reason:
+            self.fallbacks[reason] += 1
+
+    def summary(self):
+        total = sum(self.paths.values()) or 1
+        paths = ", ".join(f"{p} {n} ({n / total:.0%})" for p, n in self.paths.most_common())
+        line = f"🌐 Fetch paths: {paths or 'none'}"
+        if self.fallbacks:
+            line += " | browser fallbacks: " + ", ".join(f"{r} {n}" for r, n in self.fallbacks.most_common())
+        return line
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Listing photo stage: download once over a pooled session, key by content hash,
+and store WebP renditions sized for the map (thumb) and detail views (medium).
+Identical photos (e.g. units in the same building) share one set of blobs.
+"""
+import hashlib
+import io
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import requests
+from azure.storage.blob import ContentSettings
+from PIL import Image
+from requests.adapters import HTTPAdapter
+
+# Bounding boxes; aspect ratio is kept
+IMAGE_SIZES = {"thumb": (320, 320), "medium": (1024, 1024)}
+WEBP_QUALITY = 80
+IMAGE_TIMEOUT_SEC = 10
+
+# Content-addressed blobs never change, so browsers and CDNs may cache them forever
+IMAGE_CONTENT_SETTINGS = ContentSettings(content_type="image/webp", cache_control="public, max-age=31536000, immutable")
+
+
+def image_hash(data):
+    return hashlib.sha256(data).hexdigest()[:32]
+
+def image_blob_name(size, digest):
+    return f"images/{size}/{digest}.webp"
+
+def render_sizes(data):
+    """Process-pool task: decode once, return {size: WebP bytes} for every IMAGE_SIZES entry."""
+    with Image.open(io.BytesIO(data)) as img:
+        img = img.convert("RGB")
+        out = {}
+        for size, box in IMAGE_SIZES.items():
+            copy = img.copy()
+            copy.thumbnail(box, Image.LANCZOS)
+            buf = io.BytesIO()
+            copy.save(buf, format="WEBP", quality=WEBP_QUALITY, method=4)
+            out[size] = buf.getvalue()
+        return out
+
+def resolved(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+def resolve_when_stored(uploads, result, digest):
+    """Resolves `result` to `digest` once every upload future is done and True, else to None."""
+    remaining = [len(uploads)]
+    lock = threading.Lock()
+
+    def on_done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        result.set_result(digest if all(f.result() for f in uploads) else None)
+
+    for upload in uploads:
+        upload.add_done_callback(on_done)
+
+
+class ImagePipeline:
+    """
+    submit() downloads on the calling thread, renders on a process pool, and
+    hands the renditions to an UploadQueue whose BlobIndex skips photos that are
+    already stored. It returns a Future for the content hash, resolved by the
+    upload callbacks once every rendition is in the container, so the caller
+    records the hash without waiting on uploads. Photos in flight are keyed by
+    hash: the same image arriving for another listing shares that Future.
+    """
+
+    def __init__(self, upload_queue, index, workers=2, pool_size=8):
+        self.upload_queue = upload_queue
+        self.index = index
+        # spawn: the first render starts on a parse thread while upload threads and
+        # the Playwright loop are running, which fork could deadlock on
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._inflight = {}  # content hash -> Future for photos being rendered/uploaded
+        self._inflight_lock = threading.Lock()
+
+    def download(self, image_url):
+        try:
+            resp = self.session.get(image_url, timeout=IMAGE_TIMEOUT_SEC)
+            if resp.status_code == 200 and resp.content:
+                return resp.content
+        except requests.RequestException as e:
+            print(f"   -> Failed Image {image_url}: {e}")
+        return None
+
+    def submit(self, image_url):
+        """
+        Returns a Future resolving to the photo's content hash, or to None if the
+        download, render or an upload failed. Waits for the render only.
+        """
+        data = self.download(image_url)
+        if data is None:
+            return resolved(None)
+        digest = image_hash(data)
+        with self._inflight_lock:
+            if digest in self._inflight:
+                return self._inflight[digest]
+            result = self._inflight[digest] = Future()
+        result.add_done_callback(lambda _: self._forget(digest))
+
+        try:
+            missing = [size for size in IMAGE_SIZES if image_blob_name(size, digest) not in self.index]
+            if missing:
+                rendered = self.pool.submit(render_sizes, data).result()
+                for size in missing:
+                    self.upload_queue.submit(
+                        image_blob_name(size, digest),
+                        rendered[size],
+                        overwrite=True,
+                        content_settings=IMAGE_CONTENT_SETTINGS,
+                    )
+        except Exception as e:
+            print(f"   -> Failed to render image {image_url}: {e}")
+            result.set_result(None)
+            return result
+        uploads = [self.upload_queue.completion(image_blob_name(size, digest)) for size in IMAGE_SIZES]
+        resolve_when_stored(uploads, result, digest)
+        return result
+
+    def _forget(self, digest):
+        """Once settled, the index answers for this photo (a failed upload released its names)."""
+        with self._inflight_lock:
+            self._inflight.pop(digest, None)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        self.session.close()
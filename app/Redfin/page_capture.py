@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Capture mode for listing pages in Playwright. A route handler lets through only
+what can feed a parsed field (the document, Redfin's own scripts, stingray API
+calls) and aborts styles, media, trackers and other XHRs. A response listener
+keeps the property history the page fetches for itself; it stands in for the
+events when the page HTML does not carry them.
+"""
+import asyncio
+import os
+import time
+from collections import Counter
+from urllib.parse import parse_qs, urlsplit
+
+from http_fetch import has_markers
+from readiness import EVENTS_MARKERS, LISTING_MARKERS, READY_TIMEOUT_SEC, wait_ready_async
+from redfin_parser import api_events
+from url_frontier import home_id
+
+CAPTURE_API = os.getenv("CAPTURE_API", "1") == "1"
+# How long to wait for the history API when the page HTML has no events of its own
+CAPTURE_WAIT_SEC = float(os.getenv("CAPTURE_WAIT_SEC", 3))
+
+API_PREFIX = "/stingray/"
+EVENTS_PATH = "/stingray/api/home/details/belowTheFold"
+REDFIN_HOSTS = ("redfin.ca", "redfin.com", "cdn-redfin.com")
+BLOCKED_TYPES = {"image", "media", "font", "stylesheet", "ping", "manifest", "websocket", "eventsource", "texttrack"}
+# Readiness of a rendered page apart from the events, which the history API can supply instead
+PAGE_MARKERS = [group for group in LISTING_MARKERS if group is not EVENTS_MARKERS]
+
+
+def is_essential(request):
+    if request.resource_type in BLOCKED_TYPES:
+        return False
+    host = urlsplit(request.url).hostname or ""
+    if not host.endswith(REDFIN_HOSTS):
+        return False  # analytics, ads, tag managers
+    if request.resource_type in ("xhr", "fetch"):
+        return API_PREFIX in request.url
+    return True
+
+
+class CaptureStats:
+    """Shared by every page's ListingCapture for the run summary."""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def summary(self):
+        c = self.counts
+        pages = c["pages"] or 1
+        return (f"🛰️ API capture: events for {c['events']}/{c['pages']} pages ({c['events'] / pages:.0%}), "
+                f"{c['html_events']} had them in the HTML, {c['no_api']} got no API response, "
+                f"raw document used for {c['document']}, "
+                f"{c['allowed']} requests allowed, {c['aborted']} aborted")
+
+
+class ListingCapture:
+    """Owns one page's route and response hooks; load() one listing at a time."""
+
+    def __init__(self, page, stats):
+        self.page = page
+        self.stats = stats
+        self._want = None
+        self._events = None
+        self._got = asyncio.Event()
+
+    @classmethod
+    async def attach(cls, page, stats):
+        capture = cls(page, stats)
+        await page.route("**/*", capture._route)
+        page.on("response", capture._on_response)
+        return capture
+
+    async def _route(self, route):
+        if is_essential(route.request):
+            self.stats.counts["allowed"] += 1
+            await route.continue_()
+        else:
+            self.stats.counts["aborted"] += 1
+            await route.abort()
+
+    async def _on_response(self, response):
+        # propertyId is the home id, so a late response for the previous listing is ignored
+        parts = urlsplit(response.url)
+        if parts.path != EVENTS_PATH or not response.ok:
+            return
+        if parse_qs(parts.query).get("propertyId") != [str(self._want)]:
+            return
+        try:
+            events = api_events(await response.text())
+        except Exception:
+            return
+        if events is not None:
+            self._events = events
+            self._got.set()
+
+    async def _wait_events(self, watch_dom):
+        """
+        Waits up to CAPTURE_WAIT_SEC for the history API, racing the events marker
+        in the DOM when the page is rendered. Returns True when the DOM won.
+        """
+        api = asyncio.ensure_future(self._got.wait())
+        dom = None
+        if watch_dom:
+            dom = asyncio.ensure_future(wait_ready_async(self.page, [EVENTS_MARKERS], timeout=CAPTURE_WAIT_SEC))
+        waiters = [task for task in (api, dom) if task is not None]
+        try:
+            done, _ = await asyncio.wait(waiters, timeout=CAPTURE_WAIT_SEC, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in waiters:
+                task.cancel()
+        return dom in done and dom.result() is not None
+
+    async def load(self, url, timeout=READY_TIMEOUT_SEC):
+        """
+        Navigates to `url`. Returns (html, events or None, seconds until the page was
+        ready or None on a readiness timeout). The raw document is used when it already
+        carries every marker; otherwise the hydrated DOM is serialized once it has every
+        marker but the events. Only when that HTML has no events do the history API
+        (or the events turning up in the DOM) get up to CAPTURE_WAIT_SEC more; events
+        None means the parser reads them from the HTML.
+        """
+        self._want, self._events = home_id(url), None
+        self._got.clear()
+        self.stats.counts["pages"] += 1
+        start = time.perf_counter()
+
+        # domcontentloaded is much faster than load (doesn't wait for all assets)
+        response = await self.page.goto(url, wait_until="domcontentloaded", timeout=45000)
+        html = await response.text() if response is not None and response.ok else None
+        rendered = False
+        if html and has_markers(html, LISTING_MARKERS):
+            elapsed = time.perf_counter() - start
+            self.stats.counts["document"] += 1
+        else:
+            # Client-rendered: wait for the markers as the non-capture path does, except the
+            # events, so a page whose history only comes from the API isn't held to the ceiling
+            elapsed = await wait_ready_async(self.page, PAGE_MARKERS, timeout=timeout)
+            html = await self.page.content()
+            rendered = True
+
+        html_events = has_markers(html, [EVENTS_MARKERS])
+        if not html_events and not self._got.is_set():
+            if await self._wait_events(rendered):
+                html = await self.page.content()
+                html_events = True
+            elif not self._got.is_set():
+                self.stats.counts["no_api"] += 1
+
+        if self._got.is_set():
+            self.stats.counts["events"] += 1
+        elif html_events:
+            self.stats.counts["html_events"] += 1
+        return html, self._events, elapsed
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""Global request pacing shared by every concurrent Redfin worker."""
+import asyncio
+import time
+
+
+class RateLimiter:
+    """
+    Spaces request starts evenly across all workers: at most `rate` per second.
+    Slots are handed out in order, so N workers never burst N requests at once.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Page readiness for the Redfin scrapers: wait only until the data we parse is in
+the DOM, instead of sleeping a fixed hydration delay after every navigation.
+"""
+import os
+import time
+from playwright.async_api import TimeoutError as AsyncTimeoutError
+
+# Ceiling per page; on timeout callers carry on with whatever has rendered
+READY_TIMEOUT_SEC = float(os.getenv("READY_TIMEOUT_SEC", 8))
+READY_POLL_MS = 100
+
+# The events payload sits inside an escaped JSON string in the page source
+EVENTS_MARKERS = ['"events":[', '\\"events\\":[']
+
+# Listing page: every group must match (any alternative within a group)
+LISTING_MARKERS = [
+    EVENTS_MARKERS,
+    ["TREB #"],
+    ["latitude"],
+]
+
+# Search results page: at least one listing card link
+RESULTS_SELECTOR = "a[href*='/home/']"
+
+# Results pages load some cards only on scroll: scroll a step at a time until a
+# step adds no card link within the settle window (the old fixed pauses were 0.5 s)
+SCROLL_STEP_PX = 1000
+SCROLL_MAX_STEPS = 3
+SCROLL_SETTLE_SEC = float(os.getenv("SCROLL_SETTLE_SEC", 0.5))
+
+_READY_JS = """
+([groups, selector]) => {
+    if (selector && !document.querySelector(selector)) return false;
+    if (!groups.length) return true;
+    const html = document.documentElement.innerHTML;
+    return groups.every(alts => alts.some(m => html.includes(m)));
+}
+"""
+
+_COUNT_GREW_JS = """
+([selector, before]) => document.querySelectorAll(selector).length > before
+"""
+
+
+async def wait_ready_async(page, markers=(), selector=None, timeout=READY_TIMEOUT_SEC):
+    """Waits until `page` shows all marker groups / the selector. Returns seconds waited, or None on timeout."""
+    start = time.perf_counter()
+    try:
+        await page.wait_for_function(
+            _READY_JS, arg=[list(markers), selector], polling=READY_POLL_MS, timeout=timeout * 1000
+        )
+    except AsyncTimeoutError:
+        return None
+    return time.perf_counter() - start
+
+
+async def scroll_lazy_cards(page, selector=RESULTS_SELECTOR):
+    """Scrolls until a step loads no new `selector` match (at most SCROLL_MAX_STEPS). Returns the match count."""
+    count = await page.locator(selector).count()
+    for _ in range(SCROLL_MAX_STEPS):
+        await page.mouse.wheel(0, SCROLL_STEP_PX)
+        try:
+            await page.wait_for_function(
+                _COUNT_GREW_JS, arg=[selector, count], polling=READY_POLL_MS, timeout=SCROLL_SETTLE_SEC * 1000
+            )
+        except AsyncTimeoutError:
+            break
+        count = await page.locator(selector).count()
+    return count
+
+
+class ReadyStats:
+    """Collects time-to-ready per page and prints a one-line summary at the end of a run."""
+
+    def __init__(self, label):
+        self.label = label
+        self.times = []
+        self.timeouts = 0
+
+    def record(self, elapsed):
+        if elapsed is None:
+            self.timeouts += 1
+        else:
+            self.times.append(elapsed)
+
+    def summary(self):
+        if not self.times:
+            return f"⏱️ {self.label}: no pages ready ({self.timeouts} timeouts)"
+        times = sorted(self.times)
+        p50 = times[len(times) // 2]
+        p90 = times[min(len(times) - 1, int(len(times) * 0.9))]
+        return (
+            f"⏱️ {self.label}: {len(times)} ready, p50 {p50:.2f}s, p90 {p90:.2f}s, "
+            f"max {times[-1]:.2f}s, {self.timeouts} timeouts (ceiling {READY_TIMEOUT_SEC:g}s)"
+        )
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Listing page extractor shared by the Redfin scrapers and the bronze re-parse job.
+
+A listing page carries its data as JSON: the server-rendered
+root.__reactServerState.InitialContext payload (whose stingray responses are
+themselves JSON strings) and the JSON-LD <script> blocks. parse_listing locates
+those payloads in one scan of the <script> tags, decodes each once, and fills
+the record and the sale history from the decoded structure instead of running
+a marker search per field. Only the MLS number and the gallery photos live in
+the markup, and get one scan each.
+Search results pages: one regex pass for the card links, and stingray search
+JSON for card fields.
+"""
+import json
+import re
+import zlib
+from datetime import datetime
+
+BASE_IMAGE_URL = "https://ssl.cdn-redfin.com/photo/248/mbphotov3/"
+
+money_re = re.compile(r"[^\d]")
+genmid_re = re.compile(r"genMid\.([A-Za-z0-9_]+\.jpg)")
+
+script_open_re = re.compile(r"<script\b[^>]*>\s*")
+payload_re = re.compile(r"root\.__reactServerState\.InitialContext\s*=\s*")
+
+# Payload keys read into the record; each must hold a value of its type to count
+# (events: a non-empty list of event objects)
+PAYLOAD_KEYS = {
+    "events": list,
+    "latestListingInfo": dict,
+    "baths": (int, float, str),
+    "lastSaleDate": str,
+    "assembledAddress": str,
+    "postalCode": str,
+    "propertyType": str,
+    "latitude": (int, float, str),
+    "longitude": (int, float, str),
+}
+# Amenity entries are {..., "<label>": ..., "content": "<value>"}
+AMENITY_LABELS = {"Property Type", "Lot Size", "Parking"}
+
+
+def extract_between(text, start, stop="\\"):
+    markers = [start] if '"' not in start else [start, start.replace('"', r"\"")]
+    for m in markers:
+        idx = text.find(m)
+        if idx != -1:
+            i = idx + len(m)
+            j = text.find(stop, i) if stop else -1
+            return text[i:j] if j != -1 else text[i:]
+    return "N/A"
+
+def parse_date(s):
+    try:
+        return datetime.strptime(s, "%b %d, %Y")
+    except (TypeError, ValueError):
+        return None
+
+def money_to_int(s):
+    s_clean = money_re.sub("", s)
+    return int(s_clean) if s_clean else None
+
+def safe_float(val):
+    try:
+        if isinstance(val, (float, int)):
+            return float(val)
+        return float(val) if val and val != "N/A" else None
+    except (TypeError, ValueError):
+        return None
+
+def history_rows(events_list, url):
+    """Sale history rows, oldest first, from a raw events array (page-embedded or API)."""
+    rows = []
+    for e in events_list:
+        ts = e.get("eventDate")
+        day = datetime.fromtimestamp(ts / 1000) if isinstance(ts, int) else None
+        rows.append((
+            day.replace(hour=0, minute=0, second=0, microsecond=0) if day else datetime.min,
+            {
+                "url": url,
+                "eventDate": day.strftime("%b %d, %Y") if day else "",
+                "eventType": e.get("eventDescription", ""),
+                "price": str(e.get("price", "")),
+                "MLS": e.get("sourceId", ""),
+            },
+        ))
+    # Day resolution, stable: same order as sorting on the formatted dates
+    rows.sort(key=lambda r: r[0])
+    return [row for _, row in rows]
+
+def find_genmid_values(html):
+    return list(dict.fromkeys(genmid_re.findall(html)))
+
+def decode_json_text(text):
+    """A JSON document held in a string (a stingray body starts with a {}&& guard), or None."""
+    if text.startswith("{}&&"):
+        text = text[4:]
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+def decode_scripts(html):
+    """
+    Decodes the page's embedded JSON once: every <script> whose body is JSON
+    (JSON-LD and friends) and the InitialContext payload.
+    Returns (docs, json_docs): all of them in page order, and the JSON scripts alone.
+    """
+    found = []
+    for m in script_open_re.finditer(html):
+        if html.startswith(("{", "["), m.end()):
+            end = html.find("</script>", m.end())
+            doc = decode_json_text(html[m.end():end]) if end != -1 else None
+            if doc is not None:
+                found.append((m.start(), doc))
+    json_docs = [doc for _, doc in found]
+
+    m = payload_re.search(html)
+    if m:
+        try:
+            payload, _ = json.JSONDecoder().raw_decode(html, m.end())
+        except ValueError:
+            pass
+        else:
+            found.append((m.start(), payload))
+            found.sort(key=lambda item: item[0])
+    return [doc for _, doc in found], json_docs
+
+def index_payload(docs):
+    """
+    Walks decoded documents once and returns (values, amenities): the first value
+    of each PAYLOAD_KEYS key in document order, and the amenity contents by label.
+    JSON held in strings (stingray responses) is decoded only when the level above
+    it leaves a key or amenity unfilled, so the page's own JSON wins over a nested response.
+    """
+    values, amenities = {}, {}
+    level = docs
+    while level and (len(values) < len(PAYLOAD_KEYS) or len(amenities) < len(AMENITY_LABELS)):
+        nested = []
+        stack = list(reversed(level))
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                if "content" in node:
+                    for v in node.values():
+                        if isinstance(v, str) and v in AMENITY_LABELS and isinstance(node["content"], str):
+                            amenities.setdefault(v, node["content"])
+                for key, value in node.items():
+                    kind = PAYLOAD_KEYS.get(key)
+                    if kind and key not in values and isinstance(value, kind):
+                        if kind is list and not (value and isinstance(value[0], dict)):
+                            continue
+                        values[key] = value
+                stack.extend(reversed(node.values()))
+            elif isinstance(node, list):
+                stack.extend(reversed(node))
+            elif isinstance(node, str) and node[:1] == "{":
+                nested.append(node)
+        level = [doc for doc in map(decode_json_text, nested) if doc is not None]
+    return values, amenities
+
+def extract_price_from_json(json_docs):
+    """First schema.org Offer price (a dict with price + priceCurrency) in the page's JSON scripts."""
+    for data in json_docs:
+        stack = [data]
+        while stack:
+            curr = stack.pop()
+            if isinstance(curr, dict):
+                if "price" in curr and "priceCurrency" in curr:
+                    try:
+                        return int(curr["price"])
+                    except (TypeError, ValueError):
+                        break
+                if "offers" in curr:
+                    stack.append(curr["offers"])
+                for v in curr.values():
+                    if isinstance(v, (dict, list)):
+                        stack.append(v)
+            elif isinstance(curr, list):
+                stack.extend(item for item in curr if isinstance(item, (dict, list)))
+    return None
+
+def listing_mls(html, url):
+    mls = extract_between(html, "TREB #", "<")
+    if not mls or mls == "N/A":
+        # Fallback if MLS not found (maybe different region); keyed on the URL so it is stable
+        mls = f"UNKNOWN_{zlib.crc32(url.encode('utf-8'))}"
+    return mls
+
+def listing_url(html):
+    """The page's own URL from its canonical link (or og:url), for pages stored without one."""
+    idx = html.find('rel="canonical"')
+    if idx != -1:
+        tag = html[html.rfind("<", 0, idx) : html.find(">", idx)]
+        url = extract_between(tag, 'href="', '"')
+        if url != "N/A":
+            return url
+    url = extract_between(html, 'property="og:url" content="', '"')
+    return None if url == "N/A" else url
+
+def image_urls(mls, image_filenames):
+    mls_tail = mls[-3:] if len(mls) >= 3 else mls
+    return [f"{BASE_IMAGE_URL}{mls_tail}/genMid.{fn}" for fn in image_filenames]
+
+def parse_listing(html, url, extended=False, events=None):
+    """
+    Extracts the silver record, the sale history and the gallery image URLs from one listing page.
+    extended=True adds the detail fields (Square Foot, Parking, Association Fee).
+    `events` is the property history captured from the page's own API call; when
+    given it replaces the events decoded from the HTML.
+    Returns (record, history, image_urls).
+    """
+    docs, json_docs = decode_scripts(html)
+    values, amenities = index_payload(docs)
+
+    mls = listing_mls(html, url)
+    history = history_rows(events or values.get("events", []), url)
+
+    sold_evts = [h for h in history if "sold" in h["eventType"].lower()]
+    sold_evt = sold_evts[-1] if sold_evts else None
+
+    listed_evts = [h for h in history if "listed" in h["eventType"].lower() and "delisted" not in h["eventType"].lower()]
+    first_listed_evt = listed_evts[0] if listed_evts else None
+
+    sold_price = money_to_int(sold_evt["price"]) if sold_evt else None
+    if not sold_price:
+        # JSON-LD Offer price when the history has no sold price
+        sold_price = extract_price_from_json(json_docs) or sold_price
+
+    first_list_price = money_to_int(first_listed_evt["price"]) if first_listed_evt else None
+
+    days_on_market = None
+    sold_price_diff = None
+    if sold_evt and first_listed_evt:
+        d_sold = parse_date(sold_evt["eventDate"])
+        d_listed = parse_date(first_listed_evt["eventDate"])
+        if d_sold and d_listed:
+            days_on_market = (d_sold - d_listed).days
+    if sold_price and first_list_price:
+        sold_price_diff = sold_price - first_list_price
+
+    image_filenames = find_genmid_values(html)
+
+    property_type = values.get("propertyType")
+    record = {
+        "url": url,
+        "MLS": mls,
+        "Sold Price": sold_price,
+        "Number Beds": safe_float(values.get("latestListingInfo", {}).get("beds")),
+        "Number Baths": safe_float(values.get("baths")),
+        "Sold Date": sold_evt["eventDate"] if sold_evt else values.get("lastSaleDate", "N/A"),
+        "Address": values.get("assembledAddress", "N/A"),
+        "Postal Code": values.get("postalCode", "N/A"),
+        "Property Type": property_type.title() if property_type else amenities.get("Property Type"),
+    }
+    if extended:
+        record.update({
+            "Square Foot": amenities.get("Lot Size", "N/A").split(" ")[0],
+            "Parking": amenities.get("Parking", "N/A").split(" ")[0],
+            "Association Fee": extract_between(html, "Association Fee: <span>$", "<"),
+        })
+    record.update({
+        "latitude": safe_float(values.get("latitude")),
+        "longitude": safe_float(values.get("longitude")),
+        "First Listed Date": first_listed_evt["eventDate"] if first_listed_evt else None,
+        "Days On Market": days_on_market,
+        "Sold Price Difference": sold_price_diff,
+        "photo_blob": f"images/{mls}_1.jpg" if image_filenames else None,  # Azure Path
+    })
+    return record, history, image_urls(mls, image_filenames)
+
+
+# ---------------- Search results and API responses ----------------------
+
+result_link_re = re.compile(r'<a\b[^>]*?\bhref="([^"]*/home/\d+[^"]*)"')
+
+# stingray gis propertyType codes whose listing-page names are known; others stay None
+GIS_PROPERTY_TYPES = {
+    3: "Condo/Co-op",
+    4: "Multi-Family (2-4 Unit)",
+    5: "Multi-Family (5+ Unit)",
+    6: "Single Family Residential",
+    13: "Townhouse",
+}
+
+# A card becomes a provisional silver row only when all of these are present
+CARD_REQUIRED = [
+    "url", "MLS", "Sold Price", "Number Beds", "Number Baths", "Sold Date",
+    "Address", "Postal Code", "Property Type", "latitude", "longitude",
+]
+
+def search_result_urls(html):
+    """Every listing link on a results page, in page order, without duplicates."""
+    hrefs = result_link_re.findall(html)
+    return list(dict.fromkeys(h if h.startswith("http") else f"https://www.redfin.ca{h}" for h in hrefs))
+
+def stingray_payload(body):
+    """The `payload` object of a stingray API response (the body starts with a {}&& guard), or {}."""
+    try:
+        data = json.loads(body[4:] if body.startswith("{}&&") else body)
+    except ValueError:
+        return {}
+    payload = data.get("payload") if isinstance(data, dict) else None
+    return payload if isinstance(payload, dict) else {}
+
+def parse_gis_homes(body):
+    """The `homes` array of a stingray search (gis) response."""
+    homes = stingray_payload(body).get("homes")
+    return homes if isinstance(homes, list) else []
+
+def api_events(body):
+    """The property history events from a listing's belowTheFold API response, or None."""
+    events = (stingray_payload(body).get("propertyHistoryInfo") or {}).get("events")
+    return events if isinstance(events, list) else None
+
+def _value(field):
+    return field.get("value") if isinstance(field, dict) else field
+
+def card_record(home):
+    """
+    A silver record built from one search card, in parse_listing's field formats,
+    or None when the card lacks a field. Detail-only fields stay empty.
+    """
+    sold_ts = home.get("soldDate")
+    lat_long = _value(home.get("latLong")) or {}
+    href = home.get("url") or ""
+    property_type = GIS_PROPERTY_TYPES.get(home.get("propertyType"))
+    record = {
+        "url": f"https://www.redfin.ca{href}" if href.startswith("/") else href or None,
+        "MLS": _value(home.get("mlsId")),
+        "Sold Price": _value(home.get("price")),
+        "Number Beds": safe_float(home.get("beds")),
+        "Number Baths": safe_float(home.get("baths")),
+        "Sold Date": datetime.fromtimestamp(sold_ts / 1000).strftime("%b %d, %Y") if isinstance(sold_ts, int) else None,
+        "Address": _value(home.get("streetLine")),
+        "Postal Code": _value(home.get("postalCode")),
+        "Property Type": property_type.title() if property_type else None,
+        "latitude": safe_float(lat_long.get("latitude")),
+        "longitude": safe_float(lat_long.get("longitude")),
+        "First Listed Date": None,
+        "Days On Market": None,
+        "Sold Price Difference": None,
+        "photo_blob": None,
+    }
+    if not isinstance(record["Sold Price"], int) or any(record[k] in (None, "") for k in CARD_REQUIRED):
+        return None
+    return record
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Rebuilds silver listing records from stored bronze HTML, without touching the website.
+
+Streams bronze/YYYY-MM-DD/<mls>.html.gz for a date range (from Azure or a local
+mirror), parses pages on every core with redfin_parser, and writes one Parquet
+per month, deduped by MLS with the latest bronze day winning.
+Run from the project root:
+    python app/Redfin/reparse_bronze.py --start 2025-01-01 --end 2025-03-31 [--extended] [--upload]
+"""
+import argparse
+import gzip
+import itertools
+import os
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+from azure.storage.blob import BlobServiceClient
+from dotenv import load_dotenv
+
+from redfin_parser import listing_url, parse_listing
+from silver_store import new_run_id, read_month, write_part
+
+# ---------------- config --------------------------------------------------
+load_dotenv()
+
+CONN_STR = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+CONTAINER_NAME = "redfin-data"
+
+OUTPUT_DIR = Path("app/Redfin/Output/reparse")
+DOWNLOAD_WORKERS = 8
+
+# ---------------- Bronze Source -------------------------------------------
+
+def get_container_client():
+    if not CONN_STR:
+        raise ValueError("Missing AZURE_STORAGE_CONNECTION_STRING in .env (or pass --local-dir)")
+    return BlobServiceClient.from_connection_string(CONN_STR).get_container_client(CONTAINER_NAME)
+
+def days_between(start, end):
+    day = start
+    while day <= end:
+        yield day.isoformat()
+        day += timedelta(days=1)
+
+def list_bronze(start, end, container=None, local_dir=None):
+    """Yields {"name", "day", "url"} for every bronze page in [start, end]."""
+    if local_dir is not None:
+        root = local_dir / "bronze" if (local_dir / "bronze").is_dir() else local_dir
+        for day in days_between(start, end):
+            for path in sorted((root / day).glob("*.html.gz")):
+                yield {"name": str(path), "day": day, "url": None}
+        return
+    for day in days_between(start, end):
+        for blob in container.list_blobs(name_starts_with=f"bronze/{day}/", include=["metadata"]):
+            if blob.name.endswith(".html.gz"):
+                yield {"name": blob.name, "day": day, "url": (blob.metadata or {}).get("url")}
+
+def read_bronze(item, container=None):
+    if container is None:
+        return Path(item["name"]).read_bytes()
+    return container.download_blob(item["name"]).readall()
+
+def fetch_bronze(items, container=None):
+    """Yields (item, compressed bytes); at most DOWNLOAD_WORKERS downloads run ahead of the consumer."""
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+        pending = deque()
+        remaining = iter(items)
+        for item in itertools.islice(remaining, DOWNLOAD_WORKERS):
+            pending.append((item, pool.submit(read_bronze, item, container)))
+        while pending:
+            item, future = pending.popleft()
+            try:
+                data = future.result()
+            except Exception as e:
+                print(f"⚠️ Could not read {item['name']}: {e}")
+                data = None
+            nxt = next(remaining, None)
+            if nxt is not None:
+                pending.append((nxt, pool.submit(read_bronze, nxt, container)))
+            if data is not None:
+                yield item, data
+
+# ---------------- Parse ---------------------------------------------------
+
+def parse_bronze(data, url, extended):
+    """Process-pool task: decompress one bronze page and parse it into a silver record."""
+    try:
+        raw = zlib.decompress(data)
+    except zlib.error:
+        raw = gzip.decompress(data)
+    html = raw.decode("utf-8", errors="replace")
+    record, _, _ = parse_listing(html, url or listing_url(html), extended=extended)
+    return record
+
+def reparse(items, workers, extended, container=None):
+    """Yields (item, record) as pages parse; downloads, decompression and parsing all overlap."""
+    window = workers * 4
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for item, data in fetch_bronze(items, container):
+            pending.append((item, pool.submit(parse_bronze, data, item["url"], extended)))
+            while len(pending) >= window:
+                yield drain_one(pending)
+        while pending:
+            yield drain_one(pending)
+
+def drain_one(pending):
+    item, future = pending.popleft()
+    try:
+        return item, future.result()
+    except Exception as e:
+        print(f"⚠️ Parse failed for {item['name']}: {e}")
+        return item, None
+
+# ---------------- Silver Output -------------------------------------------
+
+def monthly_frames(parsed):
+    """Groups records by bronze month; within a month the latest bronze day wins per MLS."""
+    rows = {}
+    for item, record in parsed:
+        if record:
+            rows.setdefault(item["day"][:7], []).append({**record, "_day": item["day"]})
+    for month, records in sorted(rows.items()):
+        df = pd.DataFrame(records).sort_values("_day", kind="stable")
+        df = df.drop_duplicates(subset=["MLS"], keep="last").drop(columns="_day")
+        yield month, df.reset_index(drop=True)
+
+PHOTO_COLUMNS = ["photo_hash", "photo_blob"]
+
+def keep_stored_photos(container, month, df):
+    """Bronze has no photos, so re-parsed rows keep the photo columns the scraper already wrote."""
+    stored, _ = read_month(container, month)
+    cols = [c for c in PHOTO_COLUMNS if c in stored.columns]
+    if stored.empty or not cols:
+        return df
+    return df.drop(columns=cols, errors="ignore").merge(stored[["MLS", *cols]], on="MLS", how="left")
+
+def upload_month(container, month, df):
+    """Writes the re-parsed month as a new silver part; it wins over earlier parts per MLS."""
+    df = keep_stored_photos(container, month, df)
+    blob_name = write_part(container, df, month, run_id=new_run_id("reparse"))
+    print(f"   -> Uploaded {len(df)} rows to {blob_name}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild silver Parquet from bronze HTML.")
+    parser.add_argument("--start", type=date.fromisoformat, required=True, help="first bronze day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today(), help="last bronze day (default today)")
+    parser.add_argument("--local-dir", type=Path, help="read a local bronze mirror instead of Azure")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parser processes")
+    parser.add_argument("--extended", action="store_true", help="add Square Foot, Parking and Association Fee")
+    parser.add_argument("--upload", action="store_true", help="write the rebuilt months to Azure as silver parts")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    container = None if args.local_dir else get_container_client()
+    items = list_bronze(args.start, args.end, container, args.local_dir)
+
+    count = 0
+    def counted(parsed):
+        nonlocal count
+        for pair in parsed:
+            count += 1
+            if count % 500 == 0:
+                print(f"   ... parsed {count} pages ({count / (time.time() - start_time):.0f}/s)")
+            yield pair
+
+    print(f"🚀 Re-parsing bronze {args.start} .. {args.end} with {args.workers} workers...")
+    for month, df in monthly_frames(counted(reparse(items, args.workers, args.extended, container))):
+        out = OUTPUT_DIR / "silver" / month / "listed_properties.parquet"
+        out.parent.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(out, index=False)
+        print(f"✅ {month}: {len(df)} listings -> {out}")
+        if args.upload:
+            upload_month(container or get_container_client(), month, df)
+
+    print(f"⏱️ Parsed {count} pages in {time.time() - start_time:.1f}s")
+
+if __name__ == "__main__":
+    main()
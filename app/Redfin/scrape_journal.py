@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Durable per-URL scrape results (SQLite, one row per URL).
+Parsed records are journaled as soon as they exist, so a crashed or timed-out
+run loses nothing: the next run flushes any records that never reached silver.
+Which URLs still need scraping is tracked by url_frontier.
+"""
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+JOURNAL_PATH = Path("app/Redfin/Output/scrape_journal.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url        TEXT PRIMARY KEY,
+    status     TEXT NOT NULL,            -- done
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    record     TEXT,                     -- parsed silver row (JSON) until flushed
+    flushed_to TEXT,                     -- silver part the record went to
+    updated_at TEXT NOT NULL
+)
+"""
+
+
+def utc_now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class ScrapeJournal:
+    """Thread-safe: parse threads and the event loop write through one connection."""
+
+    def __init__(self, path=JOURNAL_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        # WAL keeps each per-URL commit cheap while staying crash-safe
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+
+    def _write(self, sql, params=()):
+        with self._lock:
+            self._conn.execute(sql, params)
+            self._conn.commit()
+
+    def _read(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def mark_done(self, url, record):
+        self._write(
+            """INSERT INTO pages (url, status, attempts, record, flushed_to, updated_at)
+               VALUES (?, 'done', 1, ?, NULL, ?)
+               ON CONFLICT(url) DO UPDATE SET status = 'done', attempts = attempts + 1,
+                   record = excluded.record, flushed_to = NULL, updated_at = excluded.updated_at""",
+            (url, json.dumps(record), utc_now()),
+        )
+
+    def unflushed(self):
+        """[(url, record)] parsed but not yet written to silver."""
+        rows = self._read(
+            "SELECT url, record FROM pages WHERE status = 'done' AND record IS NOT NULL AND flushed_to IS NULL"
+        )
+        return [(url, json.loads(record)) for url, record in rows]
+
+    def unflushed_count(self):
+        return self._read(
+            "SELECT count(*) FROM pages WHERE status = 'done' AND record IS NOT NULL AND flushed_to IS NULL"
+        )[0][0]
+
+    def mark_flushed(self, urls, blob_name):
+        """Records where the rows went and drops their JSON; silver is now the copy of record."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE pages SET record = NULL, flushed_to = ?, updated_at = ? WHERE url = ?",
+                [(blob_name, utc_now(), url) for url in urls],
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,18 +1,27 @@
 #!/usr/bin/env python3
 import os
 import io
+import asyncio
 import json
+import threading
 import time
 import zlib
-import re
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from playwright.sync_api import sync_playwright, TimeoutError
+from concurrent.futures import ThreadPoolExecutor
+from playwright.async_api import async_playwright
 from azure.storage.blob import BlobServiceClient
-import requests
-from bs4 import BeautifulSoup
+from image_pipeline import ImagePipeline, image_blob_name
+from page_capture import CAPTURE_API, CaptureStats, ListingCapture
+from rate_limit import RateLimiter
+from readiness import LISTING_MARKERS, ReadyStats, wait_ready_async
+from redfin_parser import parse_listing
+from scrape_journal import ScrapeJournal
+from url_frontier import UrlFrontier
+from silver_store import write_part
+from upload_queue import BlobIndex, UploadQueue
+from http_fetch import FETCH_MODE, USER_AGENT, FetchStats, fetch_html, make_session
 
 # ---------------- config --------------------------------------------------
 from dotenv import load_dotenv
@@ -31,24 +40,41 @@ CONTAINER_NAME = "redfin-data"
 TEST_MODE = False
 MAX_URLS = 1000
 
-URLS_FILE = Path("app/Redfin/Output/property_urls.txt")
-BASE_IMAGE_URL = "https://ssl.cdn-redfin.com/photo/248/mbphotov3/"
 COOKIE_FILE = Path("app/Redfin/chrome_cookies.json")
 WAIT_SEC = 2
 
+# Concurrency: pages/requests in flight, site-wide request rate, parse threads, and blob upload threads
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", 4))
+SCRAPE_RATE_PER_SEC = float(os.getenv("SCRAPE_RATE_PER_SEC", 1))
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", 4))
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 8))
+UPLOAD_QUEUE_SIZE = int(os.getenv("UPLOAD_QUEUE_SIZE", 64))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 2))
+
+# Journaled records go to silver every FLUSH_EVERY records or FLUSH_INTERVAL_SEC, whichever comes first
+FLUSH_EVERY = int(os.getenv("FLUSH_EVERY", 100))
+FLUSH_INTERVAL_SEC = float(os.getenv("FLUSH_INTERVAL_SEC", 300))
+
 # ---------------- Azure Client --------------------------------------------
-if not CONN_STR:
-    raise ValueError("Missing AZURE_STORAGE_CONNECTION_STRING in .env")
-
-# Initialize Azure Client
-try:
-    blob_service_client = BlobServiceClient.from_connection_string(CONN_STR)
-    container_client = blob_service_client.get_container_client(CONTAINER_NAME)
-    if not container_client.exists():
-        container_client.create_container()
-except Exception as e:
-    print(f"Azure Connection Error: {e}")
-    raise
+# Connected on first use: the spawn render pool re-imports this module in every
+# worker, which must not repeat the container check
+_container_client = None
+
+def get_container_client():
+    global _container_client
+    if _container_client is None:
+        if not CONN_STR:
+            raise ValueError("Missing AZURE_STORAGE_CONNECTION_STRING in .env")
+        try:
+            blob_service_client = BlobServiceClient.from_connection_string(CONN_STR)
+            container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+            if not container_client.exists():
+                container_client.create_container()
+        except Exception as e:
+            print(f"Azure Connection Error: {e}")
+            raise
+        _container_client = container_client
+    return _container_client
 
 # ---------------- Helpers -------------------------------------------------
 
@@ -64,352 +90,321 @@ def load_redfin_cookies():
         if ".redfin.ca" in c.get("domain", "")
     ]
 
-def upload_bronze_html(html_content, mls):
-    """Saves compressed HTML to bronze/YYYY-MM-DD/mls.html.gz"""
+# Set up once per run by start_uploads()
+blob_index = None
+upload_queue = None
+image_pipeline = None
+journal = None
+frontier = None
+
+def start_uploads():
+    """Lists today's bronze and all images once, and starts the background upload queue and image stage."""
+    global blob_index, upload_queue, image_pipeline
+    today = datetime.now().strftime("%Y-%m-%d")
+    container_client = get_container_client()
+    blob_index = BlobIndex(container_client, [f"bronze/{today}/", "images/"])
+    upload_queue = UploadQueue(container_client, workers=UPLOAD_WORKERS, maxsize=UPLOAD_QUEUE_SIZE, index=blob_index)
+    image_pipeline = ImagePipeline(upload_queue, blob_index, workers=IMAGE_WORKERS)
+
+def upload_bronze_html(html_content, mls, url=None):
+    """Queues compressed HTML for bronze/YYYY-MM-DD/mls.html.gz (source URL kept in blob metadata)"""
     today = datetime.now().strftime("%Y-%m-%d")
     blob_name = f"bronze/{today}/{mls}.html.gz"
-    
-    # Check if exists (Idempotency)
-    try:
-        if container_client.get_blob_client(blob_name).exists():
-            return False # Skipped
-    except:
-        pass
 
-    # Compress
-    compressed = zlib.compress(html_content.encode("utf-8"))
-    
-    blob_client = container_client.get_blob_client(blob_name)
-    blob_client.upload_blob(compressed, overwrite=True)
-    return True # Uploaded
-
-def upload_image(mls, image_url):
-    """Uploads ONLY the first image to images/mls_1.jpg"""
-    blob_name = f"images/{mls}_1.jpg"
-    blob_client = container_client.get_blob_client(blob_name)
-    
-    # Check if exists to save bandwidth/cost
-    if blob_client.exists():
-        return 
-        
+    # Idempotency: skipped if today's copy exists; compression runs on the upload thread
+    return upload_queue.submit(
+        blob_name,
+        lambda: zlib.compress(html_content.encode("utf-8")),
+        overwrite=True,
+        metadata={"url": url} if url else None,
+    )
+
+def store_photo(record, digest):
+    """
+    Points the record at its photo once the image stage has stored it:
+    photo_hash names the content-addressed renditions, photo_blob the medium one.
+    Without one, a legacy images/<mls>_1.jpg is kept if it was stored before.
+    """
+    record["photo_hash"] = digest
+    if digest:
+        record["photo_blob"] = image_blob_name("medium", digest)
+    elif record.get("photo_blob") not in blob_index:
+        record["photo_blob"] = None
+
+def finish_property(url, record, photo=None):
+    """
+    Journals a parsed listing with its photo's outcome. Runs on the parse thread, or
+    on an upload thread as the photo's completion callback when uploads were pending.
+    """
     try:
-        resp = requests.get(image_url, timeout=10)
-        if resp.status_code == 200:
-            blob_client.upload_blob(resp.content, overwrite=True)
-            # print(f"   -> Saved Image: {blob_name}")
+        digest = photo.result() if photo is not None else None
+        if photo is not None and digest is None:
+            print(f"   -> Photo not stored, leaving it out: {url}")
+        store_photo(record, digest)
+        journal.mark_done(url, record)
+        frontier.mark_scraped(url)
     except Exception as e:
-        print(f"   -> Failed Image {mls}: {e}")
-
-# ---------------- Parsing Logic (Copied from scrape_properties.py) --------
-
-def extract_between(text, start, stop="\\"):
-    markers = [start] if '"' not in start else [start, start.replace('"', r"\"")]
-    for m in markers:
-        idx = text.find(m)
-        if idx != -1:
-            i = idx + len(m)
-            j = text.find(stop, i) if stop else -1
-            return text[i:j] if j != -1 else text[i:]
-    return "N/A"
-
-def parse_date(s):
-    try:
-        return datetime.strptime(s, "%b %d, %Y")
-    except:
+        print(f"⚠️ Could not journal {url}: {e}")
+        frontier.mark_failed(url)
+
+_flush_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+def flush_silver(force=False):
+    """
+    Writes journaled records that are not in silver yet as one new part file.
+    Runs on whichever parse thread crosses the threshold; others skip while it works.
+    """
+    global _last_flush
+    if not force and journal.unflushed_count() < FLUSH_EVERY and time.monotonic() - _last_flush < FLUSH_INTERVAL_SEC:
+        return None
+    if not _flush_lock.acquire(blocking=force):
         return None
-
-money_re = re.compile(r"[^\d]")
-
-def money_to_int(s):
-    s_clean = money_re.sub("", s)
-    return int(s_clean) if s_clean else None
-
-def parse_sale_history(html, url):
-    start_marker = r'\"events\":[{'
-    
-    start_idx = html.find(start_marker)
-    if start_idx == -1:
-        start_marker = r'"events":[{'
-        start_idx = html.find(start_marker)
-    
-    if start_idx == -1:
-        return []
-
-    array_start_idx = start_idx + len(start_marker) - 2
-    candidate = html[array_start_idx : array_start_idx + 25000]
-    unescaped = candidate.replace(r'\"', '"').replace(r'\\', '\\')
-    
-    decoder = json.JSONDecoder()
     try:
-        events_list, _ = decoder.raw_decode(unescaped)
-    except json.JSONDecodeError:
-        return []
-        
-    rows = []
-    for e in events_list:
-        ts = e.get("eventDate")
-        date_str = ""
-        if isinstance(ts, int):
-            date_str = datetime.fromtimestamp(ts / 1000).strftime("%b %d, %Y")
-            
-        rows.append({
-            "url": url,
-            "eventDate": date_str,
-            "eventType": e.get("eventDescription", ""),
-            "price": str(e.get("price", "")),
-            "MLS": e.get("sourceId", "")
-        })
-    return rows
-
-def find_genmid_values(html):
-    return list(dict.fromkeys(re.findall(r"genMid\.([A-Za-z0-9_]+\.jpg)", html)))
-
-def extract_price_from_json(html):
-    soup = BeautifulSoup(html, "lxml")
-    for script in soup.find_all("script"):
-        if not script.string:
-            continue
-        try:
-            data = json.loads(script.string)
-            stack = [data]
-            while stack:
-                curr = stack.pop()
-                if isinstance(curr, dict):
-                    if "price" in curr and "priceCurrency" in curr:
-                         return int(curr["price"])
-                    if "offers" in curr:
-                        stack.append(curr["offers"])
-                    for v in curr.values():
-                        if isinstance(v, (dict, list)):
-                            stack.append(v)     
-                elif isinstance(curr, list):
-                    for item in curr:
-                         if isinstance(item, (dict, list)):
-                             stack.append(item)
-        except:
-            continue
-    return None
-
-def safe_float(val):
+        _last_flush = time.monotonic()
+        pending = journal.unflushed()
+        if not pending:
+            return None
+        records = [record for _, record in pending]
+        # Resolve FutureWarning: Wrap string in StringIO
+        new_df = pd.read_json(io.StringIO(json.dumps(records))) # Ensure types
+        # Append-only: compact_silver.py later folds parts into the monthly file
+        blob_name = write_part(get_container_client(), new_df)
+        journal.mark_flushed([url for url, _ in pending], blob_name)
+        print(f"💾 Flushed {len(new_df)} rows to {blob_name}")
+        return blob_name
+    finally:
+        _flush_lock.release()
+
+def periodic_flush():
+    """
+    flush_silver() for the parse threads. A failed write is logged, not raised: the
+    records stay journaled for the next flush, and no URL is marked failed for it.
+    """
     try:
-        if isinstance(val, (float, int)):
-            return float(val)
-        return float(val) if val and val != "N/A" else None
-    except:
-        return None
+        flush_silver()
+    except Exception as e:
+        print(f"⚠️ Silver flush failed, records stay in the journal: {e}")
 
 # ---------------- Core Logic ----------------------------------------------
 
-# ---------------- Core Logic ----------------------------------------------
+async def block_heavy(route):
+    if route.request.resource_type in ["image", "media", "font"]:
+        await route.abort()
+    else:
+        await route.continue_()
 
-def process_property(url, context):
-    # 1. Scrape HTML using existing context
-    page = context.new_page()
-    
+async def new_scrape_page(context, capture_stats=None):
+    """A pooled page, plus its ListingCapture in capture mode (which does its own blocking)."""
+    page = await context.new_page()
+    if capture_stats is not None:
+        return page, await ListingCapture.attach(page, capture_stats)
     # Block heavy resources
-    def block_heavy(route):
-        if route.request.resource_type in ["image", "media", "font"]:
-            route.abort()
+    await page.route("**/*", block_heavy)
+    return page, None
+
+async def fetch_property_html(page, url, ready_stats, capture=None):
+    """
+    Navigates a pooled page to `url`. Returns (html, API events or None), or (None, None).
+    With a capture the history comes from the page's own API call; otherwise from the hydrated HTML.
+    """
+    try:
+        if capture is not None:
+            html, events, elapsed = await capture.load(url)
         else:
-            route.continue_()
-            
-    page.route("**/*", block_heavy)
+            # domcontentloaded is much faster than load (doesn't wait for all assets)
+            await page.goto(url, wait_until="domcontentloaded", timeout=45000)
+
+            # Wait until the data we parse has hydrated, not a fixed delay
+            elapsed = await wait_ready_async(page, LISTING_MARKERS)
+            html, events = None, None
+        ready_stats.record(elapsed)
+        if elapsed is None:
+            print(f"   ⏱️ Not ready after timeout, parsing what rendered: {url}")
 
-    try:
-        # domcontentloaded is much faster than load (doesn't wait for all assets)
-        page.goto(url, wait_until="domcontentloaded", timeout=45000)
-        
-        # Short sleep to let JS hydrate (Redfin needs this)
-        time.sleep(1.5) 
-        
         if "/login" in page.url:
             print(f"🔒 Login page encountered at {url}")
-            page.close()
-            return None
-        html = page.content()
+            return None, None
+        return html or await page.content(), events
     except Exception as e:
         print(f"⚠️ Error/Timeout at {url}: {e}")
-        page.close()
-        return None
-    
-    page.close()
+        return None, None
 
-    # 2. Extract MLS
-    mls = extract_between(html, "TREB #", "<")
-    if not mls or mls == "N/A":
-        # Fallback if MLS not found (maybe different region)
-        mls = f"UNKNOWN_{int(time.time())}"
-    
-    # 3. Upload Bronze (HTLM) - Idempotent
-    uploaded = upload_bronze_html(html, mls)
-    if not uploaded:
+def process_property(url, html, events=None):
+    """Parses one listing's HTML and queues its bronze copy and image. Runs on a worker thread."""
+    record, _, images = parse_listing(html, url, events=events)
+    mls = record["MLS"]
+
+    # Upload Bronze (HTML) - Idempotent
+    queued = upload_bronze_html(html, mls, url)
+    if not queued:
         print(f"   [Bronze] Skipped {mls} (Already done today)")
     else:
-        print(f"   [Bronze] Uploaded {mls}")
+        print(f"   [Bronze] Queued {mls}")
 
-    # 4. Parse Data (Silver Logic)
-    # This logic matches your original scrape_properties.py
-    history = parse_sale_history(html, url)
-    history.sort(key=lambda h: parse_date(h["eventDate"]) or datetime.min)
-    
-    sold_evts = [h for h in history if "sold" in h["eventType"].lower()]
-    sold_evt = sold_evts[-1] if sold_evts else None
-    
-    listed_evts = [h for h in history if "listed" in h["eventType"].lower() and "delisted" not in h["eventType"].lower()]
-    first_listed_evt = listed_evts[0] if listed_evts else None
-    
-    sold_price = money_to_int(sold_evt["price"]) if sold_evt else None
-    if not sold_price:
-            json_price = extract_price_from_json(html)
-            if json_price:
-                sold_price = json_price
-    
-    first_list_price = money_to_int(first_listed_evt["price"]) if first_listed_evt else None
-    
-    beds = safe_float(extract_between(html, '"latestListingInfo":{"beds":', ","))
-    baths = safe_float(extract_between(html, '"baths":', ","))
-    lat = safe_float(extract_between(html, 'latitude":', ","))
-    lon = safe_float(extract_between(html, 'longitude":', "}"))
-    
-    days_on_market = None
-    sold_price_diff = None
-    
-    if sold_evt and first_listed_evt:
-        d_sold = parse_date(sold_evt["eventDate"])
-        d_listed = parse_date(first_listed_evt["eventDate"])
-        if d_sold and d_listed:
-            days_on_market = (d_sold - d_listed).days
-            
-    if sold_price and first_list_price:
-        sold_price_diff = sold_price - first_list_price
-
-    # 5. Handle Images (First one only)
-    mls_tail = mls[-3:] if len(mls) >= 3 else mls
-    image_filenames = find_genmid_values(html)
-    if image_filenames:
-        # Construct URL for the FIRST image
-        first_img_url = f"{BASE_IMAGE_URL}{mls_tail}/genMid.{image_filenames[0]}"
-        upload_image(mls, first_img_url)
-        first_image_blob = f"images/{mls}_1.jpg" # Reference for DB
+    # Handle Images (First one only, as thumb + medium WebP). The record is journaled
+    # when its photo's uploads complete, so this thread doesn't wait on them.
+    if images:
+        photo = image_pipeline.submit(images[0])
+        photo.add_done_callback(lambda f: finish_property(url, record, f))
     else:
-        first_image_blob = None
+        finish_property(url, record)
 
-    # Extract Property Type securely
-    prop_type_match = re.search(r'"propertyType"\s*:\s*"([^"]+)"', html)
-    if prop_type_match:
-        property_type = prop_type_match.group(1).title()
-    else:
-        property_type = extract_between(html, 'Property Type","content":"', "\\")
-        if property_type == "N/A":
-            property_type = None
-
-    # 6. Return Data Record
-    record = {
-        "url": url,
-        "MLS": mls,
-        "Sold Price": sold_price,
-        "Number Beds": beds,
-        "Number Baths": baths,
-        "Sold Date": sold_evt["eventDate"] if sold_evt else extract_between(html, '"lastSaleDate":"'),
-        "Address": extract_between(html, 'assembledAddress":"', "\\"),
-        "Postal Code": extract_between(html, '"postalCode":"', '"'),
-        "Property Type": property_type,
-        "latitude": lat,
-        "longitude": lon,
-        "First Listed Date": first_listed_evt["eventDate"] if first_listed_evt else None,
-        "Days On Market": days_on_market,
-        "Sold Price Difference": sold_price_diff,
-        "photo_blob": first_image_blob, # Azure Path
-    }
+    periodic_flush()
     return record
 
 
+class LazyBrowser:
+    """Launches Chromium on first use, so runs served entirely over HTTP never start a browser."""
+
+    def __init__(self, playwright, capture_stats=None):
+        self.playwright = playwright
+        self.capture_stats = capture_stats
+        self.browser = None
+        self.context = None
+        self._lock = asyncio.Lock()
+
+    async def new_page(self):
+        async with self._lock:
+            if self.context is None:
+                self.browser = await self.playwright.chromium.launch(headless=True)
+                self.context = await self.browser.new_context(user_agent=USER_AGENT)
+                await self.context.add_cookies(load_redfin_cookies())
+        return await new_scrape_page(self.context, self.capture_stats)
+
+    async def close(self):
+        if self.browser is not None:
+            await self.browser.close()
+
+async def scrape_worker(browser, session, queue, limiter, submit, ready_stats, fetch_stats):
+    """
+    Drains the shared URL queue: plain HTTP first, then this worker's own page
+    when the response is a challenge or lacks the markers we parse.
+    Parsing/uploads are handed off via `submit`.
+    """
+    page = capture = None
+    try:
+        while True:
+            try:
+                url = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            html, events, reason = None, None, None
+            if FETCH_MODE != "browser":
+                await limiter.wait()
+                html, reason = await asyncio.to_thread(fetch_html, session, url, LISTING_MARKERS)
+                if html:
+                    fetch_stats.record("http")
+                elif FETCH_MODE == "http":
+                    fetch_stats.record("failed", reason)
+                    print(f"⚠️ HTTP fetch failed ({reason}) at {url}")
+                    frontier.mark_failed(url)
+                    continue
+
+            if html is None:
+                await limiter.wait()
+                if page is None or page.is_closed():
+                    page, capture = await browser.new_page()
+                html, events = await fetch_property_html(page, url, ready_stats, capture)
+                fetch_stats.record("browser", reason)
+
+            if html:
+                submit(url, html, events)
+            else:
+                frontier.mark_failed(url)
+    finally:
+        if page is not None and not page.is_closed():
+            await page.close()
+
+async def scrape_all(urls):
+    """
+    Scrapes `urls` with SCRAPE_CONCURRENCY workers sharing one HTTP session and
+    one (lazily started) browser context. Every request is paced by a global
+    rate limiter; each page's HTML is parsed on a thread pool and its blobs
+    go through the background upload queue while the worker moves on.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    for url in urls:
+        queue.put_nowait(url)
+    limiter = RateLimiter(SCRAPE_RATE_PER_SEC)
+    ready_stats = ReadyStats("Listing pages")
+    fetch_stats = FetchStats()
+    capture_stats = CaptureStats() if CAPTURE_API else None
+    session = make_session(load_redfin_cookies(), pool_size=SCRAPE_CONCURRENCY)
+    pending, pending_urls = [], []
+
+    await asyncio.to_thread(start_uploads)
+
+    with ThreadPoolExecutor(max_workers=PARSE_WORKERS) as pool:
+        def submit(url, html, events=None):
+            pending.append(loop.run_in_executor(pool, process_property, url, html, events))
+            pending_urls.append(url)
+
+        # Single Browser Instance for ALL URLs, only if some page needs it
+        async with async_playwright() as p:
+            browser = LazyBrowser(p, capture_stats)
+            workers = min(SCRAPE_CONCURRENCY, len(urls)) or 1
+            await asyncio.gather(*(
+                scrape_worker(browser, session, queue, limiter, submit, ready_stats, fetch_stats)
+                for _ in range(workers)
+            ))
+            await browser.close()
+        session.close()
+        print(fetch_stats.summary())
+        if capture_stats is not None and capture_stats.counts["pages"]:
+            print(capture_stats.summary())
+        if ready_stats.times or ready_stats.timeouts:
+            print(ready_stats.summary())
+
+        scraped = 0
+        outcomes = await asyncio.gather(*pending, return_exceptions=True)
+        for url, outcome in zip(pending_urls, outcomes):
+            if isinstance(outcome, Exception):
+                print(f"⚠️ Parse/upload failed for {url}: {outcome}")
+                frontier.mark_failed(url)
+            elif outcome:
+                scraped += 1
+                print(f"✅ Processed {outcome.get('MLS', 'Unknown')}")
+
+    # Draining the uploads also runs the photo callbacks that journal the last listings
+    drain_sec = await asyncio.to_thread(upload_queue.close)
+    image_pipeline.close()
+    print(upload_queue.summary(drain_sec))
+    return scraped
+
+
 def main():
     start_time = time.time()
-    
-    # Load URLs
-    if not URLS_FILE.exists():
-        print("URL File not found!")
-        return
+    get_container_client()  # Fail fast on a missing or unreachable storage account
+
+    # Resume: finish writing a previous run's records first
+    global journal, frontier
+    journal = ScrapeJournal()
+    if flush_silver(force=True):
+        print("ℹ️ Recovered unflushed records from an interrupted run")
+
+    # Work comes from the frontier (filled by get_properties.py), newest discoveries first
+    frontier = UrlFrontier()
+    print(f"🚀 Frontier: {frontier.counts()}")
 
-    with URLS_FILE.open("r", encoding="utf-8") as f:
-        urls = [u.strip() for u in f if u.strip()]
-    
-    print(f"🚀 Found {len(urls)} total URLs.")
-    
     # LIMIT BATCH SIZE (Prevent timeouts)
     MAX_SCRAPE_COUNT = int(os.getenv("MAX_SCRAPE_COUNT", 10))
-    if len(urls) > MAX_SCRAPE_COUNT:
-        print(f"⚠️ Limiting scrape to last {MAX_SCRAPE_COUNT} URLs (Configured by MAX_SCRAPE_COUNT)")
-        urls = urls[-MAX_SCRAPE_COUNT:]
+    urls = frontier.next_batch(MAX_SCRAPE_COUNT)
         
-    print(f"🚀 Starting scrape for {len(urls)} properties...")
+    print(f"🚀 Starting scrape for {len(urls)} properties "
+          f"({SCRAPE_CONCURRENCY} workers, {SCRAPE_RATE_PER_SEC:g} req/s, fetch mode {FETCH_MODE})...")
 
-    results = []
-    
-    # Single Browser Instance for ALL URLs (Much Faster)
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context(user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36")
-        context.add_cookies(load_redfin_cookies())
-        
-        for url in urls:
-            res = process_property(url, context)
-            if res:
-                results.append(res)
-                print(f"✅ Processed {res.get('MLS', 'Unknown')}")
-        
-        browser.close()
-    
-    # 7. Save Silver (Parquet) to Azure
-    # 7. Save Silver (Parquet) to Azure
-    if results:
-        # Resolve FutureWarning: Wrap string in StringIO
-        new_df = pd.read_json(io.StringIO(json.dumps(results))) # Ensure types
-        
-        # Determine target blob name
-        today_month = datetime.now().strftime("%Y-%m")
-        blob_name = f"silver/{today_month}/listed_properties.parquet"
-        
-        # Check if blob exists and merge
-        try:
-            print(f"Checking for existing data in {blob_name}...")
-            blob_client = container_client.get_blob_client(blob_name)
-            
-            if blob_client.exists():
-                print("   -> Found existing file. Downloading to merge...")
-                existing_data = blob_client.download_blob().readall()
-                existing_df = pd.read_parquet(io.BytesIO(existing_data))
-                
-                # Combine and Deduplicate (Keep latest scrape for same MLS)
-                combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-                # Drop duplicates based on MLS, keeping the LAST occurrence (newest scrape)
-                combined_df = combined_df.drop_duplicates(subset=["MLS"], keep="last")
-                
-                print(f"   -> Merged {len(new_df)} new rows with {len(existing_df)} existing rows. Total: {len(combined_df)}")
-                final_df = combined_df
-            else:
-                print("   -> No existing file. Creating new.")
-                final_df = new_df
-                
-        except Exception as e:
-            print(f"⚠️ Error merging with existing blob: {e}")
-            print("   -> Falling back to saving ONLY new data to avoid total loss.")
-            final_df = new_df
+    scraped = asyncio.run(scrape_all(urls)) if urls else 0
 
-        # Save locally first
-        local_parquet = "temp_silver.parquet"
-        final_df.to_parquet(local_parquet, index=False)
-        
-        # Upload to Azure Silver
-        with open(local_parquet, "rb") as data:
-            container_client.upload_blob(name=blob_name, data=data, overwrite=True)
-            
-        print(f"\n🎉 Success! Uploaded {len(final_df)} rows to {blob_name}")
-        if os.path.exists(local_parquet):
-            os.remove(local_parquet)
+    # 7. Save the rest of the Silver (Parquet) to Azure as a new part file
+    if flush_silver(force=True) or scraped:
+        print(f"\n🎉 Success! Scraped {scraped} listings this run")
     else:
         print("No valid results found.")
+    journal.close()
+    frontier.close()
 
     print(f"⏱️ Total time: {time.time() - start_time:.1f}s")
 
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Silver layout: silver/YYYY-MM/listed_properties.parquet is the month's compacted
+base, and every writer adds an immutable silver/YYYY-MM/part-<runid>.parquet
+next to it. Run ids start with a UTC timestamp, so name order is write order.
+Readers take the base, then parts in name order, and the latest row per MLS wins.
+"""
+import io
+import secrets
+from datetime import datetime, timezone
+
+import pandas as pd
+
+SILVER_PREFIX = "silver/"
+BASE_FILE = "listed_properties.parquet"
+
+
+def new_run_id(label=None):
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return "-".join(p for p in (stamp, label, secrets.token_hex(3)) if p)
+
+def current_month():
+    return datetime.now().strftime("%Y-%m")
+
+def is_part(name):
+    filename = name.rsplit("/", 1)[-1]
+    return filename.startswith("part-") and filename.endswith(".parquet")
+
+def list_month_files(container, month):
+    """Returns (base name or None, [part names oldest first]) for one month."""
+    base, parts = None, []
+    for blob in container.list_blobs(name_starts_with=f"{SILVER_PREFIX}{month}/"):
+        if blob.name.endswith(BASE_FILE):
+            base = blob.name
+        elif is_part(blob.name):
+            parts.append(blob.name)
+    return base, sorted(parts)
+
+def list_months(container):
+    """{month: number of part files} for every month under silver/."""
+    months = {}
+    for blob in container.list_blobs(name_starts_with=SILVER_PREFIX):
+        month = blob.name[len(SILVER_PREFIX):].split("/", 1)[0]
+        months.setdefault(month, 0)
+        if is_part(blob.name):
+            months[month] += 1
+    return months
+
+def read_parquet_blob(container, name, columns=None):
+    data = container.download_blob(name).readall()
+    return pd.read_parquet(io.BytesIO(data), columns=columns)
+
+def read_month(container, month, columns=None):
+    """The month's rows with the latest scrape winning per MLS. Also returns the part names read."""
+    base, parts = list_month_files(container, month)
+    frames = [read_parquet_blob(container, name, columns) for name in ([base] if base else []) + parts]
+    if not frames:
+        return pd.DataFrame(columns=columns), parts
+    df = pd.concat(frames, ignore_index=True)
+    if "MLS" in df.columns:
+        df = df.drop_duplicates(subset=["MLS"], keep="last")
+    return df.reset_index(drop=True), parts
+
+def write_part(container, df, month=None, run_id=None):
+    """Uploads `df` as a new immutable part file and returns its blob name."""
+    blob_name = f"{SILVER_PREFIX}{month or current_month()}/part-{run_id or new_run_id()}.parquet"
+    buf = io.BytesIO()
+    df.to_parquet(buf, index=False)
+    buf.seek(0)
+    # overwrite=False: a part is never rewritten, so concurrent runs cannot clobber each other
+    container.upload_blob(name=blob_name, data=buf, overwrite=False)
+    return blob_name
+
+def compact_month(container, month):
+    """
+    Folds the month's parts into its base file, then deletes exactly the parts
+    that were folded in. Parts written meanwhile stay and still win over the base.
+    Returns (rows in the new base, parts compacted).
+    """
+    df, parts = read_month(container, month)
+    if not parts:
+        return len(df), 0
+    buf = io.BytesIO()
+    df.to_parquet(buf, index=False)
+    buf.seek(0)
+    container.upload_blob(name=f"{SILVER_PREFIX}{month}/{BASE_FILE}", data=buf, overwrite=True)
+    for name in parts:
+        container.delete_blob(name)
+    return len(df), len(parts)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Blob existence index and background upload queue for the Redfin scrapers.
+One prefix listing per run answers "already uploaded?" locally, and uploads
+run on their own threads with retries so blob latency never stalls scraping.
+"""
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+UPLOAD_RETRIES = 3
+RETRY_BACKOFF_SEC = 1.0
+
+
+class BlobIndex:
+    """Names under the given prefixes, listed once; claim() also reserves names this run queues."""
+
+    def __init__(self, container, prefixes):
+        self._names = set()
+        self._lock = threading.Lock()
+        start = time.perf_counter()
+        for prefix in prefixes:
+            self._names.update(b.name for b in container.list_blobs(name_starts_with=prefix))
+        print(f"ℹ️ Indexed {len(self._names)} existing blobs under {', '.join(prefixes)} "
+              f"in {time.perf_counter() - start:.1f}s")
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._names
+
+    def claim(self, name):
+        """True if `name` is new (and now reserved for this caller), False if it exists or is queued."""
+        with self._lock:
+            if name in self._names:
+                return False
+            self._names.add(name)
+            return True
+
+    def release(self, name):
+        with self._lock:
+            self._names.discard(name)
+
+
+class UploadQueue:
+    """
+    Bounded queue drained by worker threads. `data` may be bytes or a callable
+    returning bytes (or None to skip), so downloads such as images also happen
+    off the caller's thread. Failed uploads are retried with backoff.
+    completion() hands out the outcome of an upload as a Future, without waiting.
+    """
+
+    def __init__(self, container, workers=8, maxsize=64, index=None):
+        self.container = container
+        self.index = index
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._results = {}  # name -> Future(bool) for uploads queued this run
+        self._results_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._threads = [threading.Thread(target=self._run, daemon=True) for _ in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, name, data, **upload_kwargs):
+        """Queues an upload unless the index says the blob exists. Blocks while the queue is full."""
+        future = Future()
+        with self._results_lock:
+            if self.index is not None and not self.index.claim(name):
+                self._count("skipped")
+                return False
+            self._results[name] = future
+        self._queue.put((name, data, upload_kwargs, future))
+        return True
+
+    def completion(self, name):
+        """
+        Future resolving to True once `name` is in the container: this run's upload
+        of it, or an already done one for a blob that existed before the run.
+        """
+        with self._results_lock:
+            future = self._results.get(name)
+            if future is None:
+                future = Future()
+                future.set_result(self.index is not None and name in self.index)
+        return future
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            name, data, upload_kwargs, future = item
+            ok = False
+            try:
+                ok = self._upload(name, data, upload_kwargs)
+            finally:
+                future.set_result(ok)
+                self._queue.task_done()
+
+    def _upload(self, name, data, upload_kwargs):
+        """Returns True once the blob is stored, False if it was skipped as empty or failed."""
+        for attempt in range(1, UPLOAD_RETRIES + 1):
+            try:
+                payload = data() if callable(data) else data
+                if payload is None:
+                    self._count("empty")
+                    if self.index is not None:
+                        self.index.release(name)
+                    return False
+                self.container.get_blob_client(name).upload_blob(payload, **upload_kwargs)
+                self._count("uploaded")
+                return True
+            except Exception as e:
+                if attempt == UPLOAD_RETRIES:
+                    print(f"   -> Upload failed for {name}: {e}")
+                    self._count("failed")
+                    if self.index is not None:
+                        self.index.release(name)
+                    return False
+                self._count("retries")
+                time.sleep(RETRY_BACKOFF_SEC * 2 ** (attempt - 1))
+
+    def close(self):
+        """Waits for every queued upload, stops the workers and returns the drain time in seconds."""
+        start = time.perf_counter()
+        self._queue.join()
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        return time.perf_counter() - start
+
+    def summary(self, drain_sec):
+        s = self.stats
+        return (f"📦 Uploads: {s['uploaded']} uploaded, {s['skipped']} skipped (exist), "
+                f"{s['failed']} failed, {s['retries']} retries, {s['empty']} empty; "
+                f"queue drained in {drain_sec:.1f}s")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+URL frontier: every listing discovered so far, keyed by the Redfin home id
+(the number after /home/ in the URL), with its scrape status.
+get_properties adds to it, scrape_properties_prod pulls work from it, and a
+"known?" check is one primary-key lookup instead of a silver download.
+Small run state (e.g. the discovery high-water mark) lives in the meta table.
+"""
+import json
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+FRONTIER_PATH = Path("app/Redfin/Output/url_frontier.sqlite")
+
+# Scraping gives up on a listing after this many failed attempts
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS homes (
+    home_id       INTEGER PRIMARY KEY,
+    url           TEXT NOT NULL,
+    status        TEXT NOT NULL,         -- discovered | carded | scraped | failed
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    discovered_at TEXT NOT NULL,
+    updated_at    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS homes_status ON homes (status, discovered_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL                  -- JSON
+);
+"""
+
+home_id_re = re.compile(r"/home/(\d+)")
+
+
+def home_id(url):
+    match = home_id_re.search(url)
+    return int(match.group(1)) if match else None
+
+def utc_now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class UrlFrontier:
+    """Thread-safe: parse threads and the event loop share one connection."""
+
+    def __init__(self, path=FRONTIER_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def __contains__(self, url):
+        hid = home_id(url)
+        with self._lock:
+            return hid is not None and self._conn.execute(
+                "SELECT 1 FROM homes WHERE home_id = ?", (hid,)
+            ).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM homes").fetchone()[0]
+
+    def add(self, urls, status="discovered"):
+        """Inserts URLs whose home id is new; returns the ones that were added, in order."""
+        now = utc_now()
+        added = []
+        with self._lock:
+            for url in urls:
+                hid = home_id(url)
+                if hid is None:
+                    continue
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO homes (home_id, url, status, discovered_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (hid, url, status, now, now),
+                )
+                if cur.rowcount:
+                    added.append(url)
+            self._conn.commit()
+        return added
+
+    def next_batch(self, limit, max_attempts=MAX_ATTEMPTS):
+        """
+        Up to `limit` URLs still to scrape, newest discoveries first. Carded homes
+        (already in silver from their search card) only fill what is left.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT url FROM homes
+                   WHERE status IN ('discovered', 'carded') OR (status = 'failed' AND attempts < ?)
+                   ORDER BY status = 'carded', discovered_at DESC, home_id DESC LIMIT ?""",
+                (max_attempts, limit),
+            ).fetchall()
+        return [url for (url,) in rows]
+
+    def _set_status(self, urls, status, attempt):
+        now = utc_now()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE homes SET status = ?, attempts = attempts + ?, updated_at = ? WHERE home_id = ?",
+                [(status, attempt, now, hid) for hid in map(home_id, urls) if hid is not None],
+            )
+            self._conn.commit()
+
+    def mark_scraped(self, *urls):
+        self._set_status(urls, "scraped", 1)
+
+    def mark_failed(self, *urls):
+        self._set_status(urls, "failed", 1)
+
+    def mark_carded(self, *urls):
+        self._set_status(urls, "carded", 0)
+
+    def counts(self):
+        """{status: number of homes}."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, count(*) FROM homes GROUP BY status").fetchall())
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, json.dumps(value)),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
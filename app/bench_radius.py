@@ -0,0 +1,84 @@
+"""
+Benchmark: /filtered-points radius query latency vs dataset size, with and
+without the cell index. Uses synthetic listings spread over the Ottawa area.
+Queries run the way workers serve them: against the local snapshot file,
+attached read-only (see load_snapshot in app.main).
+Matches are counted rather than fetched, so only the predicate work is timed.
+Run from the project root: python -m app.bench_radius
+"""
+import os
+import tempfile
+import time
+
+import numpy as np
+import pyarrow as pa
+
+os.environ["DATASET_MODE"] = "build"  # Skip the import-time load in app.main
+
+from app import main
+
+SIZES = [10_000, 100_000, 200_000, 500_000, 1_000_000]
+RADII_KM = [0.5, 1, 2, 5, 10, 20]
+REPEATS = 20
+
+
+def synthetic_silver(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pa.table({
+        "MLS": [f"X{i}" for i in range(n)],
+        "url": ["https://www.redfin.ca/on/ottawa/home/0"] * n,
+        "Sold Price": rng.integers(200_000, 2_000_000, n),
+        "Sold Date": ["Aug 02, 2024"] * n,
+        "latitude": rng.uniform(45.25, 45.55, n),
+        "longitude": rng.uniform(-76.0, -75.4, n),
+        "Number Beds": rng.integers(1, 6, n).astype(float),
+        "Days On Market": rng.integers(1, 120, n),
+        "Sold Price Difference": rng.integers(-50_000, 50_000, n),
+    })
+
+
+def load_snapshot(n):
+    """Loads n synthetic listings like a full load, saves the snapshot and serves it."""
+    main.serve_snapshot(None)
+    main.build_properties_table(main.con, "properties_staging")
+    main.con.register("silver_chunk", synthetic_silver(n))
+    main.insert_silver_chunk(main.con, "properties_staging", "silver_chunk", "silver/bench")
+    main.con.unregister("silver_chunk")
+    main.sort_by_cell("properties_staging")
+    main.apply_swap()
+    main._silver_versions = {"silver/bench": str(n)}
+    main.save_snapshot()
+    assert main.load_snapshot(), "Snapshot did not load"
+
+
+def time_query(center, radius_km, use_cell_index):
+    query, params = main.build_filtered_query(center[0], center[1], radius_km, {}, use_cell_index)
+    query = f"SELECT count(*) FROM ({query})"
+    cur = main.get_cursor()
+    cur.execute(query, params).fetchone()  # Warm up
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        matches = cur.execute(query, params).fetchone()[0]
+    return (time.perf_counter() - start) / REPEATS * 1000, matches
+
+
+def run():
+    center = (45.4215, -75.6972)
+    main.SNAPSHOT_DIR = tempfile.mkdtemp(prefix="bench_radius_")
+    rows = []
+    for n in SIZES:
+        load_snapshot(n)
+        for radius in RADII_KM:
+            ranges = len(main.radius_cell_ranges(*main.radius_bbox(center[0], center[1], radius)))
+            bbox_ms, matches = time_query(center, radius, use_cell_index=False)
+            cell_ms, _ = time_query(center, radius, use_cell_index=True)
+            rows.append((n, radius, ranges, matches, bbox_ms, cell_ms))
+
+    print(f"\nCELL_ZOOM={main.CELL_ZOOM}, MAX_CELL_RANGES={main.MAX_CELL_RANGES}")
+    print(f"{'rows':>10} {'radius':>7} {'ranges':>7} {'matches':>8} {'bbox ms':>9} {'cell ms':>9}")
+    for n, radius, ranges, matches, bbox_ms, cell_ms in rows:
+        print(f"{n:>10} {radius:>5}km {ranges:>7} {matches:>8} {bbox_ms:>9.2f} {cell_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,16 @@
+"""
+Builds (or incrementally refreshes) the local dataset snapshot once and exits.
+Run from the project root: python -m app.build_snapshot
+gunicorn.conf.py runs it before forking when DATASET_MODE=shared.
+"""
+import os
+import sys
+
+os.environ["DATASET_MODE"] = "build"  # Skip the import-time load in app.main
+
+from app.main import build_snapshot
+
+if __name__ == "__main__":
+    success, msg = build_snapshot()
+    print(msg)
+    sys.exit(0 if success else 1)
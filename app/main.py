@@ -1,13 +1,28 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory
 import json
 import os
+import gzip
+import hashlib
 import duckdb
-import pandas as pd
 import numpy as np
 import sys
+import itertools
+import subprocess
+import threading
 import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.parquet as pq
 from dotenv import load_dotenv
 
+try:
+    import brotli
+except ImportError:  # Optional: gzip is always available
+    brotli = None
+
 # ---------------- Config --------------------------------------------------
 load_dotenv()
 
@@ -20,160 +35,865 @@ BASE_IMG_URL = f"https://{ACCOUNT_NAME}.blob.core.windows.net/{CONTAINER_NAME}/"
 # DuckDB Setup
 con = duckdb.connect(database=":memory:")
 
-def load_data():
-    global con
-    try:
-        from azure.storage.blob import BlobServiceClient
-        import io
-        
-        # 1. Connect to Azure using Python SDK (Reliable on Heroku)
-        if not AZURE_CONN_STR:
-             print("⚠️ AZURE_STORAGE_CONNECTION_STRING not found. Running in offline/empty mode.")
-             return False, "Missing Connection String"
+# /points.json cache for the current dataset version (reset by load_data, built on first request)
+_points_cache = None
+
+# ETag of every silver file currently loaded, for incremental refreshes
+_silver_versions = {}
+_load_lock = threading.Lock()
+
+# Grid index resolution: zoom 20 Web Mercator tiles (~30 m in Ottawa)
+GRID_ZOOM = 20
+GRID_SIZE = 2 ** GRID_ZOOM
+
+# Spatial index for radius queries: zoom 12 cells (~7 km in Ottawa), keyed
+# column-major (cell_x * CELL_COUNT + cell_y). Full loads store the table sorted
+# by cell and refreshes append changed rows in cell order, so each column of
+# cells is one contiguous key range that zone maps can skip to.
+CELL_ZOOM = 12
+CELL_COUNT = 2 ** CELL_ZOOM
+CELL_SHIFT = GRID_ZOOM - CELL_ZOOM
+MERCATOR_MAX_LAT = 85.05  # Web Mercator is undefined at the poles; coordinates are clamped into range
+# Only a single cell range beats the bbox alone (python -m app.bench_radius: about
+# 2x at 0.5-1 km from 100k rows up). Several ORed ranges are no faster and lose at
+# 5-20 km, and finer zooms split small radii into several ranges.
+MAX_CELL_RANGES = 1
+
+# Typed schema of the 'properties' table: (column, silver column, DuckDB conversion)
+PROPERTY_COLUMNS = [
+    ("mls", "MLS", "CAST({} AS VARCHAR)"),
+    ("url", "url", "CAST({} AS VARCHAR)"),
+    ("address", "Address", "CAST({} AS VARCHAR)"),
+    ("postal_code", "Postal Code", "CAST({} AS VARCHAR)"),
+    ("ptype", "Property Type", "CAST({} AS VARCHAR)"),
+    ("latitude", "latitude", "to_double({})"),
+    ("longitude", "longitude", "to_double({})"),
+    ("price", "Sold Price", "to_int({})"),
+    ("beds", "Number Beds", "to_double({})"),
+    ("baths", "Number Baths", "to_double({})"),
+    ("sold_date", "Sold Date", "to_date({})"),
+    ("first_listed_date", "First Listed Date", "to_date({})"),
+    ("dom", "Days On Market", "to_int({})"),
+    ("price_diff", "Sold Price Difference", "to_int({})"),
+    ("photo_blob", "photo_blob", "CAST({} AS VARCHAR)"),
+    ("photo_hash", "photo_hash", "CAST({} AS VARCHAR)"),
+]
+
+# Content-addressed listing photos written by app/Redfin/image_pipeline.py; the map shows thumbnails
+PHOTO_THUMB_PATH = "images/thumb/{}.webp"
 
+def create_typed_macros(conn):
+    """Registers the cast helpers used by PROPERTY_COLUMNS on a connection."""
+    conn.execute("CREATE OR REPLACE MACRO to_double(x) AS nullif(try_cast(x AS DOUBLE), 'NaN'::DOUBLE)")
+    conn.execute("CREATE OR REPLACE MACRO to_int(x) AS try_cast(to_double(x) AS INTEGER)")
+    conn.execute("""
+        CREATE OR REPLACE MACRO to_date(x) AS coalesce(
+            try_strptime(CAST(x AS VARCHAR), ['%b %d, %Y', '%Y-%m-%d'])::DATE,
+            try_cast(try_cast(x AS TIMESTAMP) AS DATE)
+        )
+    """)
+
+def typed_properties_sql(conn, source=None):
+    """
+    SELECT converting one raw silver relation into typed 'properties' rows.
+    Derived columns are computed once here so request handlers only filter.
+    With no source, selects zero rows of the same schema.
+    Binds $img_base and $source_blob.
+    """
+    create_typed_macros(conn)
+    raw_cols = set()
+    if source:
+        raw_cols = {row[0] for row in conn.execute(f"DESCRIBE {source}").fetchall()}
+
+    # Columns missing from older silver files come through as typed NULLs
+    typed = ", ".join(
+        cast.format('"' + raw + '"' if raw in raw_cols else "NULL") + f" as {name}"
+        for name, raw, cast in PROPERTY_COLUMNS
+    )
+    from_sql = f"FROM {source}" if source else "WHERE 1=0"
+    photo_thumb = "'" + PHOTO_THUMB_PATH.replace("{}", "' || photo_hash || '") + "'"
+    merc_lat = f"radians(least(greatest(latitude, -{MERCATOR_MAX_LAT}), {MERCATOR_MAX_LAT}))"
+    return f"""
+        SELECT *,
+            price - price_diff as list_price,
+            price_diff / nullif(price - price_diff, 0) * 100 as price_diff_pct,
+            CASE
+                WHEN photo_hash IS NOT NULL AND photo_hash != '' THEN $img_base || {photo_thumb}
+                WHEN photo_blob IS NOT NULL AND photo_blob != '' THEN $img_base || photo_blob
+            END as photo,
+            strftime(sold_date, '%Y-%m') as sold_month,
+            -- Grid index: Web Mercator tile coordinates at GRID_ZOOM (see /map-points)
+            -- Inputs are clamped so a bad coordinate can't fail the whole load
+            CAST(least(greatest(
+                floor((longitude + 180) / 360 * {GRID_SIZE}), 0), {GRID_SIZE - 1}
+            ) AS INTEGER) as grid_x,
+            CAST(least(greatest(floor(
+                (1 - ln(tan({merc_lat}) + 1 / cos({merc_lat})) / pi()) / 2 * {GRID_SIZE}
+            ), 0), {GRID_SIZE - 1}) AS INTEGER) as grid_y,
+            (grid_x >> {CELL_SHIFT}) * {CELL_COUNT} + (grid_y >> {CELL_SHIFT}) as cell,
+            CAST($source_blob AS VARCHAR) as source_blob
+        FROM (SELECT {typed} {from_sql})
+    """
+
+def build_properties_table(conn, table="properties", replace=True):
+    """Creates an empty typed properties table (staging target / offline fallback)."""
+    create = "CREATE OR REPLACE TABLE" if replace else "CREATE TABLE IF NOT EXISTS"
+    conn.execute(
+        f"{create} {table} AS {typed_properties_sql(conn)}",
+        {"img_base": BASE_IMG_URL, "source_blob": None},
+    )
+
+def insert_silver_chunk(conn, table, source, source_blob):
+    """
+    Appends one silver file's rows to a typed table.
+    Files are inserted newest first, so an MLS already present is skipped
+    ("keep last" by month); duplicates inside the file keep the last row.
+    """
+    conn.execute(f"""
+        INSERT INTO {table}
+        SELECT * EXCLUDE (_rn) FROM (
+            SELECT *, row_number() OVER () as _rn
+            FROM ({typed_properties_sql(conn, source)})
+        ) chunk
+        WHERE NOT EXISTS (SELECT 1 FROM {table} p WHERE p.mls = chunk.mls)
+        QUALIFY row_number() OVER (PARTITION BY mls ORDER BY _rn DESC) = 1
+    """, {"img_base": BASE_IMG_URL, "source_blob": source_blob})
+
+# ---------------- Silver Source -------------------------------------------
+# Set SILVER_LOCAL_DIR to a local mirror of the container (containing silver/...)
+# to load without Azure. Azurite works through AZURE_STORAGE_CONNECTION_STRING.
+SILVER_LOCAL_DIR = os.getenv("SILVER_LOCAL_DIR")
+SILVER_LOAD_WORKERS = int(os.getenv("SILVER_LOAD_WORKERS", 4))
+
+_container_client = None
+
+def get_container_client():
+    global _container_client
+    if _container_client is None:
+        from azure.storage.blob import BlobServiceClient
         blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONN_STR)
-        container_client = blob_service_client.get_container_client(CONTAINER_NAME)
-        
-        # 2. Iterate to find ALL 'listed_properties.parquet' files in silver/
-        print("🔍 Searching for parquet files in 'silver/'...")
-        blobs = container_client.list_blobs(name_starts_with="silver/")
-        
-        dfs = []
-        for blob in blobs:
-            if blob.name.endswith("listed_properties.parquet"):
-                print(f"   -> Found: {blob.name}")
-                blob_client = container_client.get_blob_client(blob.name)
-                data = blob_client.download_blob().readall()
-                
-                # Load into Pandas (BytesIO)
-                df_chunk = pd.read_parquet(io.BytesIO(data))
-                dfs.append(df_chunk)
-                    
-        if dfs:
-            # 3. Combine all dataframes
-            full_df = pd.concat(dfs, ignore_index=True)
-            
-            # Deduplicate just in case (e.g. same MLS in multiple months - shouldn't happen but good safety)
-            full_df = full_df.drop_duplicates(subset=["MLS"], keep="last")
-            
-            # 4. Register as DuckDB View
-            con.register('df_parquet_view', full_df)
-            con.execute("CREATE OR REPLACE VIEW properties AS SELECT * FROM df_parquet_view")
-            print(f"✅ Registered 'properties' view with {len(full_df)} rows (merged from {len(dfs)} files).")
-            return True, f"Loaded {len(full_df)} rows from {len(dfs)} files"
-        else:
-            print("⚠️ No parquet files found in Azure 'silver/' folder.")
-            con.execute("CREATE OR REPLACE VIEW properties AS SELECT CAST(NULL AS DOUBLE) as latitude, CAST(NULL AS DOUBLE) as longitude, CAST(NULL AS DOUBLE) as \"Sold Price\", CAST(NULL AS VARCHAR) as \"Sold Date\", CAST(NULL AS VARCHAR) as \"Address\", CAST(NULL AS VARCHAR) as MLS, CAST(NULL AS DOUBLE) as \"Number Beds\", CAST(NULL AS DOUBLE) as \"Number Baths\", CAST(NULL AS VARCHAR) as url, CAST(NULL AS VARCHAR) as photo_blob, CAST(NULL AS DOUBLE) as \"Days On Market\", CAST(NULL AS DOUBLE) as \"Sold Price Difference\" WHERE 1=0")
-            return False, "No parquet files found"
+        _container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+    return _container_client
+
+def is_silver_blob(name):
+    """Monthly compacted files plus the append-only part-<runid>.parquet files scrape runs write."""
+    if not name.startswith("silver/"):
+        return False
+    filename = name.rsplit("/", 1)[-1]
+    return filename.endswith("listed_properties.parquet") or (
+        filename.startswith("part-") and filename.endswith(".parquet")
+    )
+
+def list_silver_blobs():
+    """
+    Returns [{name, etag, last_modified}] for every silver file, newest first.
+    Name order is recency: later months sort higher, and within a month parts
+    (timestamped run ids) sort above the compacted file and after each other.
+    """
+    blobs = []
+    if SILVER_LOCAL_DIR:
+        root = Path(SILVER_LOCAL_DIR)
+        for path in (root / "silver").rglob("*.parquet"):
+            name = path.relative_to(root).as_posix()
+            if is_silver_blob(name):
+                stat = path.stat()
+                blobs.append({
+                    "name": name,
+                    "etag": f"{stat.st_mtime_ns:x}-{stat.st_size:x}",
+                    "last_modified": datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+                })
+    else:
+        for blob in get_container_client().list_blobs(name_starts_with="silver/"):
+            if is_silver_blob(blob.name):
+                blobs.append({"name": blob.name, "etag": blob.etag, "last_modified": blob.last_modified})
+    return sorted(blobs, key=lambda b: b["name"], reverse=True)
+
+def read_silver_table(name):
+    """Reads one silver parquet file into an Arrow table (no pandas round trip)."""
+    if SILVER_LOCAL_DIR:
+        return pq.read_table(Path(SILVER_LOCAL_DIR) / name, memory_map=True)
+    data = get_container_client().download_blob(name).readall()
+    return pq.read_table(pa.BufferReader(data))
+
+def fetch_silver_tables(blobs):
+    """
+    Yields (blob, table) in the given order. At most SILVER_LOAD_WORKERS
+    downloads run ahead of the consumer, which bounds peak memory.
+    """
+    with ThreadPoolExecutor(max_workers=SILVER_LOAD_WORKERS) as pool:
+        pending = deque()
+        remaining = iter(blobs)
+        for blob in itertools.islice(remaining, SILVER_LOAD_WORKERS):
+            pending.append((blob, pool.submit(read_silver_table, blob["name"])))
+        while pending:
+            blob, future = pending.popleft()
+            table = future.result()
+            nxt = next(remaining, None)
+            if nxt is not None:
+                pending.append((nxt, pool.submit(read_silver_table, nxt["name"])))
+            yield blob, table
+
+def stage_silver_blobs(blobs, table):
+    """Loads the given silver files (newest first) into a fresh typed staging table."""
+    build_properties_table(con, table)
+    for blob, arrow_table in fetch_silver_tables(blobs):
+        print(f"   -> Loaded: {blob['name']} ({arrow_table.num_rows} rows)")
+        con.register("silver_chunk", arrow_table)
+        insert_silver_chunk(con, table, "silver_chunk", blob["name"])
+        con.unregister("silver_chunk")
+
+def apply_full_load(blobs):
+    """Rebuilds 'properties' from every silver file in cell order and swaps it in."""
+    stage_silver_blobs(blobs, "properties_staging")
+    sort_by_cell("properties_staging")
+    apply_swap()
+
+def sort_by_cell(table):
+    """Rewrites a table in cell order, so nearby listings share row groups (and zone maps)."""
+    con.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM {table} ORDER BY cell, mls")
+
+def apply_swap():
+    """Replaces 'properties' with the finished 'properties_staging' table."""
+    con.execute("BEGIN TRANSACTION")
+    con.execute("DROP TABLE IF EXISTS properties")
+    con.execute("ALTER TABLE properties_staging RENAME TO properties")
+    con.execute("COMMIT")
+
+def apply_delta(changed, removed):
+    """
+    Upserts changed silver files into 'properties' keyed on MLS.
+    The merged table is staged and swapped in (see apply_swap), so request
+    cursors see either the old snapshot or the new one, never a mix.
+    Returns False without touching 'properties' when the delta cannot be
+    applied on its own: an MLS that a changed/removed file used to supply is
+    missing from the delta, and an older file not in memory may still hold it.
+    """
+    stage_silver_blobs(changed, "properties_delta")
+    stale = [b["name"] for b in changed] + removed
+    orphaned = con.execute("""
+        SELECT count(*) FROM properties p
+        WHERE list_contains($stale, p.source_blob)
+          AND NOT EXISTS (SELECT 1 FROM properties_delta d WHERE d.mls = p.mls)
+    """, {"stale": stale}).fetchone()[0]
+    if orphaned:
+        con.execute("DROP TABLE properties_delta")
+        print(f"   -> {orphaned} listings lost their source file. Falling back to a full load.")
+        return False
+
+    # Rows previously supplied by changed/removed files are re-supplied by the delta.
+    # Older files lose to the delta; newer files still win over it.
+    # Kept rows stay in their cell order; only the delta is sorted, and goes at the end.
+    con.execute("""
+        CREATE OR REPLACE TABLE properties_staging AS
+        SELECT * FROM properties p
+        WHERE NOT list_contains($stale, p.source_blob)
+          AND NOT EXISTS (SELECT 1 FROM properties_delta d WHERE d.mls = p.mls AND p.source_blob < d.source_blob)
+    """, {"stale": stale})
+    con.execute("""
+        INSERT INTO properties_staging
+        SELECT * FROM properties_delta d
+        WHERE NOT EXISTS (
+            SELECT 1 FROM properties p
+            WHERE p.mls = d.mls AND p.source_blob > d.source_blob AND NOT list_contains($stale, p.source_blob)
+        )
+        ORDER BY cell, mls
+    """, {"stale": stale})
+    con.execute("DROP TABLE properties_delta")
+    apply_swap()
+    return True
+
+def load_data(incremental=False):
+    """
+    Loads silver data into 'properties'. With incremental=True, only files
+    whose ETag changed since the last load are fetched and upserted.
+    """
+    global _silver_versions
+    with _load_lock:
+        try:
+            # 1. Connect to Azure using Python SDK (Reliable on Heroku)
+            if not AZURE_CONN_STR and not SILVER_LOCAL_DIR:
+                 print("⚠️ AZURE_STORAGE_CONNECTION_STRING not found. Running in offline/empty mode.")
+                 build_properties_table(con, replace=False)
+                 refresh_points_cache()
+                 return False, "Missing Connection String"
+
+            # 2. Find ALL silver files (monthly 'listed_properties.parquet' plus part files)
+            print("🔍 Searching for parquet files in 'silver/'...")
+            blobs = list_silver_blobs()
+            versions = {b["name"]: b["etag"] for b in blobs}
+
+            # Another worker may already have written a snapshot for exactly this listing
+            if incremental and versions != _silver_versions and read_manifest().get("versions") == versions:
+                if load_snapshot():
+                    return True, "Adopted local snapshot"
 
+            if not blobs:
+                print("⚠️ No parquet files found in 'silver/' folder.")
+                build_properties_table(con)
+                _silver_versions = {}
+                refresh_points_cache()
+                return False, "No parquet files found"
+
+            # 3. Fetch only what changed (everything on the first load)
+            if incremental and _silver_versions:
+                changed = [b for b in blobs if _silver_versions.get(b["name"]) != b["etag"]]
+                removed = [name for name in _silver_versions if name not in versions]
+                if not changed and not removed:
+                    print("✅ Silver data unchanged. Nothing to refresh.")
+                    return True, "Already up to date"
+                materialize_snapshot()
+                if apply_delta(changed, removed):
+                    msg = f"Refreshed {len(changed)} changed and {len(removed)} removed files"
+                else:
+                    apply_full_load(blobs)
+                    msg = f"Loaded {len(blobs)} files"
+            else:
+                apply_full_load(blobs)
+                msg = f"Loaded {len(blobs)} files"
+            # From here on this worker serves its own table instead of the snapshot
+            serve_snapshot(None)
+            _silver_versions = versions
+
+            total = con.execute("SELECT count(*) FROM properties").fetchone()[0]
+            print(f"✅ 'properties' table has {total} rows. {msg}.")
+            refresh_points_cache()
+            save_snapshot()
+            return True, f"{msg} ({total} rows)"
+
+        except Exception as e:
+            sys.stderr.write(f"CRITICAL ERROR loading data from Azure: {e}\n{traceback.format_exc()}\n")
+            # Keep serving the previous data; create an empty table only if there is none
+            try:
+                 con.execute("ROLLBACK")
+            except:
+                pass
+            try:
+                 con.execute("DROP TABLE IF EXISTS properties_staging")
+                 con.execute("DROP TABLE IF EXISTS properties_delta")
+                 build_properties_table(con, replace=False)
+                 refresh_points_cache()
+            except:
+                pass
+            return False, str(e)
+
+# ---------------- Local Snapshot ------------------------------------------
+# The loaded table is persisted as a DuckDB database file tagged with the silver
+# ETags it was built from. Workers start from it (attached read-only, no network)
+# and revalidate against the remote in the background. They keep serving the
+# snapshot until a refresh actually changes something. Unlike a registered Arrow
+# table, the attached table keeps the cell order and zone maps of the table it
+# was written from, and workers on one host read it through the same page cache.
+# SNAPSHOT_DIR="" disables.
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", str(Path(__file__).resolve().parent.parent / ".snapshot"))
+
+def read_manifest():
+    if not SNAPSHOT_DIR:
+        return {}
+    try:
+        with open(Path(SNAPSHOT_DIR) / "manifest.json", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+def save_snapshot():
+    """Writes 'properties' to a new snapshot file, then atomically repoints the manifest."""
+    if not SNAPSHOT_DIR:
+        return
+    try:
+        snap_dir = Path(SNAPSHOT_DIR)
+        snap_dir.mkdir(parents=True, exist_ok=True)
+        tag = hashlib.sha1(json.dumps(_silver_versions, sort_keys=True).encode()).hexdigest()[:12]
+        data_file = f"properties-{tag}.duckdb"
+
+        # Write to temp names and rename, so readers never see a partial file.
+        # The copy keeps the row order (and so the zone maps) of 'properties'.
+        tmp = snap_dir / f"{data_file}.{os.getpid()}.tmp"
+        tmp.unlink(missing_ok=True)
+        con.execute(f"ATTACH {sql_string(tmp)} AS snapshot_out")
+        try:
+            con.execute("CREATE TABLE snapshot_out.properties AS SELECT * FROM properties")
+            rows = con.execute("SELECT count(*) FROM snapshot_out.properties").fetchone()[0]
+        finally:
+            con.execute("DETACH snapshot_out")
+        os.replace(tmp, snap_dir / data_file)
+
+        manifest = {
+            "file": data_file,
+            "versions": _silver_versions,
+            "rows": rows,
+            "created": datetime.now(timezone.utc).isoformat(),
+        }
+        tmp = snap_dir / f"manifest.json.{os.getpid()}.tmp"
+        tmp.write_text(json.dumps(manifest), encoding="utf-8")
+        os.replace(tmp, snap_dir / "manifest.json")
+
+        # Old generations can go: processes that attached them keep the open file
+        for old in snap_dir.glob("properties-*.duckdb"):
+            if old.name != data_file:
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
+        print(f"💾 Saved local snapshot {data_file} ({rows} rows)")
     except Exception as e:
-        sys.stderr.write(f"CRITICAL ERROR loading data from Azure: {e}\n{traceback.format_exc()}\n")
-        # Create empty table as fallback
+        sys.stderr.write(f"ERROR saving snapshot: {e}\n{traceback.format_exc()}\n")
+
+def sql_string(value):
+    """Quotes a path or name as a SQL string literal (ATTACH takes no bound parameters)."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+def attach_snapshot(data_file):
+    """
+    Attaches a snapshot file read-only. Returns (database name, column names, row count).
+    Several processes can attach the same file read-only at once.
+    """
+    db = "snapshot_" + hashlib.sha1(data_file.encode()).hexdigest()[:12]
+    con.execute(f"ATTACH IF NOT EXISTS {sql_string(Path(SNAPSHOT_DIR) / data_file)} AS {db} (READ_ONLY)")
+    columns = [row[0] for row in con.execute(f"DESCRIBE {db}.properties").fetchall()]
+    rows = con.execute(f"SELECT count(*) FROM {db}.properties").fetchone()[0]
+    return db, columns, rows
+
+def serve_snapshot(db):
+    """
+    Makes request cursors read 'properties' from an attached snapshot (None: this
+    worker's own table). The snapshot being replaced stays attached until the
+    next switch, so requests that already hold a cursor on it can finish.
+    """
+    global _snapshot_db, _retired_snapshot_db
+    if db == _snapshot_db:
+        return
+    if _retired_snapshot_db not in (None, db):
         try:
-             con.execute("CREATE OR REPLACE VIEW properties AS SELECT CAST(NULL AS DOUBLE) as latitude, CAST(NULL AS DOUBLE) as longitude, CAST(NULL AS DOUBLE) as \"Sold Price\", CAST(NULL AS VARCHAR) as \"Sold Date\", CAST(NULL AS VARCHAR) as \"Address\", CAST(NULL AS VARCHAR) as MLS, CAST(NULL AS DOUBLE) as \"Number Beds\", CAST(NULL AS DOUBLE) as \"Number Baths\", CAST(NULL AS VARCHAR) as url, CAST(NULL AS VARCHAR) as photo_blob, CAST(NULL AS DOUBLE) as \"Days On Market\", CAST(NULL AS DOUBLE) as \"Sold Price Difference\" WHERE 1=0")
-        except:
-            pass
-        return False, str(e)
+            con.execute(f"DETACH DATABASE IF EXISTS {_retired_snapshot_db}")
+        except duckdb.Error as e:
+            sys.stderr.write(f"ERROR detaching snapshot {_retired_snapshot_db}: {e}\n")
+    _retired_snapshot_db, _snapshot_db = _snapshot_db, db
+
+def load_snapshot():
+    """
+    Serves 'properties' from the local snapshot. Returns False if there is no usable one.
+    The snapshot is attached read-only, so workers on one host share its file pages;
+    a worker only copies it (materialize_snapshot) when its own refresh has a delta to apply.
+    """
+    global _silver_versions
+    manifest = read_manifest()
+    if not manifest.get("file"):
+        return False
+    try:
+        db, columns, rows = attach_snapshot(manifest["file"])
+
+        # Snapshots written by an older schema are ignored
+        build_properties_table(con, "properties_staging")
+        expected = [row[0] for row in con.execute("DESCRIBE properties_staging").fetchall()]
+        con.execute("DROP TABLE properties_staging")
+        if columns != expected:
+            print("⚠️ Local snapshot schema is outdated. Ignoring it.")
+            con.execute(f"DETACH {db}")
+            return False
+
+        serve_snapshot(db)
+        con.execute("DROP TABLE IF EXISTS properties")  # A private copy from an earlier load
+        _silver_versions = manifest.get("versions", {})
+        print(f"✅ Loaded local snapshot {manifest['file']} ({rows} rows, {manifest.get('created')})")
+        refresh_points_cache()
+        return True
+    except Exception as e:
+        sys.stderr.write(f"ERROR loading snapshot: {e}\n{traceback.format_exc()}\n")
+        return False
+
+def materialize_snapshot():
+    """Copies the attached snapshot into this worker's own 'properties' table, for apply_delta."""
+    if _snapshot_db is None:
+        return
+    con.execute(f"CREATE OR REPLACE TABLE properties AS SELECT * FROM {_snapshot_db}.properties")
+
+def init_data():
+    """Startup: serve the local snapshot right away if there is one, else do a full load."""
+    if load_snapshot():
+        if AZURE_CONN_STR or SILVER_LOCAL_DIR:
+            threading.Thread(target=load_data, kwargs={"incremental": True}, daemon=True).start()
+    else:
+        load_data()
+
+# ---------------- Shared Dataset ------------------------------------------
+# DATASET_MODE=shared: the snapshot is built once (gunicorn.conf.py runs
+# app/build_snapshot.py before forking) and every worker attaches the same
+# DuckDB file read-only, holding only cursors over it. Memory then no longer
+# grows with the worker count. The default "local" serves the snapshot too, but
+# each worker refreshes on its own and takes a private copy once data changes.
+DATASET_MODE = os.getenv("DATASET_MODE", "local")
+
+_snapshot_db = None  # Attached snapshot database serving 'properties' (None: the worker's own table)
+_retired_snapshot_db = None
+_shared_manifest_mtime = None
+
+def get_cursor():
+    """Per-request DuckDB cursor with 'properties' resolved for the current mode."""
+    cur = con.cursor()
+    if _snapshot_db is not None:
+        cur.execute(f"USE {_snapshot_db}")
+    return cur
+
+def attach_shared_snapshot():
+    """Attaches the published snapshot read-only. Returns False if there is none."""
+    global _shared_manifest_mtime
+    try:
+        mtime = (Path(SNAPSHOT_DIR) / "manifest.json").stat().st_mtime_ns
+        manifest = read_manifest()
+        db, _, rows = attach_snapshot(manifest["file"])
+    except Exception as e:
+        sys.stderr.write(f"ERROR attaching shared snapshot: {e}\n")
+        return False
+
+    serve_snapshot(db)
+    _shared_manifest_mtime = mtime
+    print(f"✅ Attached shared snapshot {manifest['file']} ({rows} rows)")
+    refresh_points_cache()
+    return True
+
+def sync_shared_snapshot():
+    """Re-attaches if another process published a newer snapshot (one stat per call)."""
+    try:
+        mtime = (Path(SNAPSHOT_DIR) / "manifest.json").stat().st_mtime_ns
+    except OSError:
+        return
+    if mtime != _shared_manifest_mtime:
+        with _load_lock:
+            if mtime != _shared_manifest_mtime:
+                attach_shared_snapshot()
+
+def build_snapshot():
+    """Brings the local snapshot up to date with silver, synchronously."""
+    if load_snapshot():
+        return load_data(incremental=True)
+    return load_data()
+
+def run_snapshot_builder():
+    """Rebuilds the shared snapshot in a child process so workers never hold a writable copy."""
+    result = subprocess.run(
+        [sys.executable, "-m", "app.build_snapshot"],
+        cwd=Path(__file__).resolve().parent.parent,
+    )
+    if result.returncode != 0:
+        return False, "Snapshot build failed"
+    sync_shared_snapshot()
+    return True, "Snapshot rebuilt"
+
+# ---------------- Wire Formats --------------------------------------------
+
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+# ?format= values: per-row objects (default), one array per field, or an Arrow IPC stream
+WIRE_FORMATS = ("json", "columns", "arrow")
+
+def fetch_arrow(result):
+    """Fetches a DuckDB result as a pyarrow Table (newer DuckDB hands back a reader)."""
+    table = result.arrow()
+    if isinstance(table, pa.RecordBatchReader):
+        table = table.read_all()
+    return table
+
+def requested_format():
+    """Wire format for this request: ?format= wins, then an explicit Arrow Accept header."""
+    fmt = request.args.get("format")
+    if fmt in WIRE_FORMATS:
+        return fmt
+    if request.accept_mimetypes.best_match(["application/json", ARROW_MIMETYPE]) == ARROW_MIMETYPE:
+        return "arrow"
+    return "json"
+
+def encode_points(table, fmt, meta):
+    """
+    Serializes an Arrow table of points plus metadata (summary, date_range) to bytes.
+    Points are converted column-wise (Arrow or DuckDB's JSON writer, see points_json);
+    nulls come out as JSON null. For Arrow, each meta entry is stored as JSON in the
+    schema metadata.
+    Returns (body, mimetype).
+    """
+    if fmt == "arrow":
+        table = table.replace_schema_metadata(
+            {k: json.dumps(v, default=str) for k, v in meta.items()}
+        )
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes(), ARROW_MIMETYPE
+
+    # The points are spliced in as JSON text; the other fields are small
+    head = {"format": "columns", "count": table.num_rows} if fmt == "columns" else {}
+    fields = {**head, "points": None, **meta}
+    body = ",".join(
+        json.dumps(k) + ":" + (
+            points_json(table, fmt) if k == "points"
+            else json.dumps(v, separators=(",", ":"), default=str)
+        )
+        for k, v in fields.items()
+    )
+    return ("{" + body + "}").encode("utf-8"), "application/json"
+
+def points_json(table, fmt):
+    """
+    JSON text of the points: an object of column arrays for "columns", else an array of
+    row objects. Each column is wrapped zero-copy as one list value and DuckDB's to_json
+    writes it in one call, so no Python object is built per value.
+    """
+    columns = [table[name].combine_chunks() for name in table.column_names]
+    bounds = [0, table.num_rows]
+    if fmt == "columns":
+        wrapped = pa.table({name: pa.ListArray.from_arrays(bounds, col) for name, col in zip(table.column_names, columns)})
+        sql = "SELECT to_json(points_json)::VARCHAR FROM points_json"
+    else:
+        rows = pa.StructArray.from_arrays(columns, table.column_names)
+        wrapped = pa.table({"points": pa.ListArray.from_arrays(bounds, rows)})
+        sql = "SELECT to_json(points)::VARCHAR FROM points_json"
+    cur = con.cursor()
+    cur.register("points_json", wrapped)
+    return cur.execute(sql).fetchone()[0]
+
+# ---------------- Points Cache --------------------------------------------
+
+def sanitize(obj):
+    """Recursively convert numpy scalars to JSON-safe Python values (NaN/inf -> None)."""
+    if isinstance(obj, (np.integer, int)):
+        return int(obj)
+    if isinstance(obj, (np.floating, float)):
+        if np.isnan(obj) or np.isinf(obj):
+            return None
+        return float(obj)
+    if isinstance(obj, dict):
+        return {k: sanitize(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [sanitize(v) for v in obj]
+    return obj
+
+# Columns served by /points.json, in order
+POINT_FIELDS = [
+    "latitude", "longitude", "price", "sold_date", "address", "mls", "beds", "baths",
+    "url", "photo_blob", "dom", "price_diff", "ptype", "list_price", "price_diff_pct", "photo",
+]
+POINT_COLUMNS_SQL = ", ".join(
+    "strftime(sold_date, '%Y-%m-%d') as sold_date" if c == "sold_date" else c
+    for c in POINT_FIELDS
+)
+
+def build_points_payload():
+    """
+    Runs the full /points.json query. Returns (points Arrow table, meta dict).
+    Rows come out in MLS order, so the body (and its content-hash version) does
+    not depend on how the table happens to be stored.
+    """
+    cur = get_cursor()
+    table = fetch_arrow(cur.execute(f"""
+        SELECT {POINT_COLUMNS_SQL} FROM properties
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+        ORDER BY mls
+    """))
+    return table, build_points_meta(cur)
+
+def build_points_meta(cur):
+    """Metadata sent with every points payload: the sold date range of the data."""
+    min_date, max_date = cur.execute("SELECT min(sold_date), max(sold_date) FROM properties").fetchone()
+    date_range = {
+        "min_date": min_date.strftime("%Y-%m-%d") if min_date else None,
+        "max_date": max_date.strftime("%Y-%m-%d") if max_date else None,
+    }
+    return {"date_range": date_range}
+
+BROTLI_QUALITY = 5  # The default (11) takes tens of seconds on the full payload for a few percent
+GZIP_LEVEL = 6
+
+def refresh_points_cache():
+    """
+    Starts a fresh /points.json cache for the data just loaded. Nothing is queried
+    or serialized here (this runs at import time in every worker); points_cache()
+    builds it on first use and points_body() encodes each variant on first request.
+    """
+    global _points_cache
+    _points_cache = {"lock": threading.Lock()}
+
+def points_cache():
+    """The /points.json cache for the current data, built by the first request that needs it."""
+    cache = _points_cache
+    if cache is None:
+        return None
+    with cache["lock"]:
+        if "version" not in cache:
+            try:
+                table, meta = build_points_payload()
+                body, mimetype = encode_points(table, "json", meta)
+            except Exception as e:
+                sys.stderr.write(f"ERROR building points cache: {e}\n{traceback.format_exc()}\n")
+                return cache
+            cache["table"] = table
+            cache.setdefault("meta", meta)
+            cache["bodies"] = {("json", "identity"): (body, mimetype)}
+            # Content hash as version: identical across gunicorn workers for identical data
+            cache["version"] = hashlib.sha1(body).hexdigest()[:16]
+            print(f"✅ Built /points.json cache v{cache['version']} ({table.num_rows} points, json {len(body) / 1024:.0f} KB)")
+    return cache
+
+def points_meta():
+    """The payload metadata for the current data, without building the /points.json bodies."""
+    cache = _points_cache
+    if cache is None:
+        return None
+    with cache["lock"]:
+        if "meta" not in cache:
+            cache["meta"] = build_points_meta(get_cursor())
+        return cache["meta"]
+
+def points_body(cache, fmt, encoding):
+    """Returns (body, mimetype) for one wire format and content encoding, serializing it once per version."""
+    with cache["lock"]:
+        key = (fmt, encoding)
+        if key not in cache["bodies"]:
+            if (fmt, "identity") not in cache["bodies"]:
+                cache["bodies"][(fmt, "identity")] = encode_points(cache["table"], fmt, cache["meta"])
+            body, mimetype = cache["bodies"][(fmt, "identity")]
+            if encoding == "br":
+                body = brotli.compress(body, quality=BROTLI_QUALITY)
+            elif encoding == "gzip":
+                body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            cache["bodies"][key] = (body, mimetype)
+        return cache["bodies"][key]
 
 # Initial Load
-load_data()
+if DATASET_MODE == "shared":
+    if not attach_shared_snapshot():
+        print("⚠️ No shared snapshot found. Falling back to a per-worker load.")
+        init_data()
+elif DATASET_MODE != "build":
+    init_data()
 
 # ---------------- App -----------------------------------------------------
 
 app = Flask(__name__, template_folder="../templates", static_folder="../static")
 
+@app.before_request
+def pick_up_shared_snapshot():
+    if DATASET_MODE == "shared":
+        sync_shared_snapshot()
+
 @app.route("/")
 def home():
     return render_template("index.html")
 
 @app.route("/refresh-data", methods=["POST"])
 def refresh_data():
-    """Trigger a data reload from Azure without restarting"""
-    success, msg = load_data()
+    """Trigger a data reload from Azure without restarting (only changed files are fetched)"""
+    if DATASET_MODE == "shared":
+        success, msg = run_snapshot_builder()
+    else:
+        success, msg = load_data(incremental=True)
     return jsonify({"success": success, "message": msg})
 
 @app.route("/points.json")
 def points():
+    """Serve the prebuilt points body for the current dataset version."""
+    cache = points_cache()
+    if cache is None or "version" not in cache:
+        return jsonify({"error": "Points cache not built"}), 503
+
+    # Pick the requested wire format, then the best compressed variant the client accepts
+    fmt = requested_format()
+    encoding = request.accept_encodings.best_match(
+        (["br"] if brotli else []) + ["gzip", "identity"],
+        default="identity",
+    )
+    etag = cache["version"] if fmt == "json" else f"{cache['version']}-{fmt}"
+    if encoding != "identity":
+        etag = f"{etag}-{encoding}"
+
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        body, mimetype = points_body(cache, fmt, encoding)
+        response = Response(body, mimetype=mimetype)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["Vary"] = "Accept, Accept-Encoding"
+    response.headers["X-Dataset-Version"] = cache["version"]
+    return response
+
+
+# ---------------- Viewport API --------------------------------------------
+# Below CLUSTER_MAX_ZOOM the map gets one cluster per grid cell (1/4 of a
+# 256px tile), so the payload is bounded by screen size, not listing count.
+CLUSTER_MAX_ZOOM = 15  # From this zoom on the map gets listings instead of clusters
+CLUSTER_CELL_BITS = 2
+MAX_VIEWPORT_POINTS = 5000
+
+def map_point_filters(args, params):
+    """
+    WHERE clauses for the optional /map-points filters, mirroring the /filtered-points
+    body: center=lat,lng&radius_km=..., min_price, max_price, sold_start, sold_end,
+    and repeated beds / ptypes.
+    """
+    filters = {k: args[k] for k in ("min_price", "max_price", "sold_start", "sold_end") if k in args}
+    filters["beds"] = args.getlist("beds")
+    filters["ptypes"] = args.getlist("ptypes")
+    clauses = filter_clauses(filters, params)
+    if "center" in args and "radius_km" in args:
+        params["center_lat"], params["center_lng"] = (float(v) for v in args["center"].split(","))
+        params["radius_km"] = float(args["radius_km"])
+        clauses.append(f"{DISTANCE_KM_SQL} <= $radius_km")
+    return clauses
+
+@app.route("/map-points")
+def map_points():
+    """
+    Listings inside ?bbox=west,south,east,north at ?zoom=z: clusters when zoomed out, points when zoomed in.
+    Takes the sidebar's filters too (see map_point_filters), so the map shows what the list shows.
+    """
     try:
-        # 1. Query DuckDB for ALL points (with valid coords)
-        query = """
-            SELECT 
-                latitude, longitude, "Sold Price" as price, 
-                "Sold Date" as sold_date, 
-                "Address" as address, 
-                MLS as mls, 
-                "Number Beds" as beds, 
-                "Number Baths" as baths, 
-                url, 
-                photo_blob, 
-                "Days On Market" as dom,
-                "Sold Price Difference" as price_diff,
-                "Property Type" as ptype
-            FROM properties
-            WHERE latitude IS NOT NULL AND longitude IS NOT NULL
-        """
-        # Return as Pandas DataFrame for easy manipulation
-        df = con.execute(query).fetchdf()
-        
-        # 2. Add calculated fields
-        # List Price = Sold - Diff
-        df["list_price"] = df["price"] - df["price_diff"]
-        
-        # Avoid division by zero
-        df["price_diff_pct"] = np.where(
-            df["list_price"] != 0, 
-            (df["price_diff"] / df["list_price"]) * 100, 
-            0
-        )
+        west, south, east, north = (float(v) for v in request.args["bbox"].split(","))
+        zoom = min(max(int(request.args.get("zoom", CLUSTER_MAX_ZOOM)), 0), GRID_ZOOM)
+        params = {"west": west, "south": south, "east": east, "north": north}
+        filter_where = "".join(f" AND {clause}" for clause in map_point_filters(request.args, params))
+    except (KeyError, ValueError):
+        return jsonify({"error": "Expected ?bbox=west,south,east,north&zoom=int"}), 400
 
-        # Construct Image URL
-        if "photo_blob" in df.columns:
-            df["photo"] = df["photo_blob"].apply(
-                lambda x: f"{BASE_IMG_URL}{x}" if pd.notna(x) and x else None
-            )
-        else:
-            df["photo"] = None
+    try:
+        cur = get_cursor()
+        in_bbox = f"""
+            latitude BETWEEN $south AND $north AND longitude BETWEEN $west AND $east {filter_where}
+        """
+        meta = points_meta()
+        date_range = meta["date_range"] if meta else None
 
-        # Clean NaNs for JSON - Convert to object type first to handle Nones
-        df = df.astype(object).where(pd.notnull(df), None)
-        points_data = df.to_dict(orient="records")
-        
-        # Sanitize output
-        def sanitize(obj):
-            if isinstance(obj, (np.integer, int)):
-                return int(obj)
-            if isinstance(obj, (np.floating, float)):
-                if np.isnan(obj) or np.isinf(obj):
-                    return None
-                return float(obj)
-            if isinstance(obj, dict):
-                return {k: sanitize(v) for k, v in obj.items()}
-            if isinstance(obj, list):
-                return [sanitize(v) for v in obj]
-            return obj
-            
-        points_data = sanitize(points_data)
-
-        # Get the actual date range from the data
-        date_range = {"min_date": None, "max_date": None}
-        try:
-            dates_df = con.execute("""
-                SELECT "Sold Date" FROM properties
-                WHERE "Sold Date" IS NOT NULL AND "Sold Date" != ''
-            """).fetchdf()
-            if not dates_df.empty:
-                parsed = pd.to_datetime(dates_df["Sold Date"], format="mixed", dayfirst=False)
-                parsed = parsed.dropna()
-                if not parsed.empty:
-                    date_range["min_date"] = parsed.min().strftime("%Y-%m-%d")
-                    date_range["max_date"] = parsed.max().strftime("%Y-%m-%d")
-        except Exception as e:
-            sys.stderr.write(f"Date range error: {e}\n")
+        if zoom >= CLUSTER_MAX_ZOOM:
+            count = cur.execute(f"SELECT count(*) FROM properties WHERE {in_bbox}", params).fetchone()[0]
+            if count <= MAX_VIEWPORT_POINTS:
+                table = fetch_arrow(cur.execute(f"SELECT {POINT_COLUMNS_SQL} FROM properties WHERE {in_bbox}", params))
+                meta = {"mode": "points", "zoom": zoom, "date_range": date_range}
+                body, mimetype = encode_points(table, requested_format(), meta)
+                return Response(body, mimetype=mimetype)
 
-        return jsonify({"points": points_data, "date_range": date_range})
+        # Group on the precomputed grid: a bit shift per row, no distance math
+        shift = max(GRID_ZOOM - zoom - CLUSTER_CELL_BITS, 0)
+        rows = cur.execute(f"""
+            SELECT count(*), avg(latitude), avg(longitude), avg(price), any_value(mls)
+            FROM properties
+            WHERE {in_bbox}
+            GROUP BY grid_x >> {shift}, grid_y >> {shift}
+        """, params).fetchall()
+        clusters = [
+            {
+                "count": count,
+                "latitude": lat,
+                "longitude": lng,
+                "avg_price": round(avg_price) if avg_price is not None else None,
+                "mls": mls if count == 1 else None,
+            }
+            for count, lat, lng, avg_price, mls in rows
+        ]
+        return jsonify({"mode": "clusters", "zoom": zoom, "date_range": date_range, "clusters": sanitize(clusters)})
 
     except Exception as e:
-        sys.stderr.write(f"ERROR in points: {str(e)}\n{traceback.format_exc()}\n")
+        sys.stderr.write(f"ERROR in map_points: {str(e)}\n{traceback.format_exc()}\n")
         return jsonify({"error": str(e)}), 500
 
 
@@ -193,97 +913,120 @@ def update_coordinates():
     print("Received coordinates:", data)
     return jsonify(success=True, received=data)
 
+# Haversine distance from the search center, in km
+DISTANCE_KM_SQL = """
+    6371 * 2 * asin(sqrt(
+        pow(sin(radians(latitude - $center_lat) / 2), 2)
+        + cos(radians($center_lat)) * cos(radians(latitude))
+        * pow(sin(radians(longitude - $center_lng) / 2), 2)
+    ))
+"""
+
+# Every /filtered-points predicate runs on the typed table with bound parameters
+FILTERED_POINTS_SQL = f"""
+    WITH in_radius AS (
+        SELECT *, {DISTANCE_KM_SQL} as distance_km
+        FROM properties
+        -- Spatial index + bounding box prefilter so the haversine only runs on nearby rows
+        WHERE {{cell_where}} latitude BETWEEN $min_lat AND $max_lat
+          AND longitude BETWEEN $min_lng AND $max_lng
+    )
+    SELECT 
+        latitude, longitude, price, strftime(sold_date, '%Y-%m-%d') as sold_date, address, mls,
+        beds, baths, url, photo, dom, price_diff_pct, ptype, sold_month, distance_km
+    FROM in_radius
+    WHERE distance_km <= $radius_km {{extra_where}}
+"""
+
+def radius_bbox(center_lat, center_lng, radius_km):
+    """Returns (min_lat, max_lat, min_lng, max_lng) enclosing a radius around a point."""
+    dlat = radius_km / 111.195
+    dlng = radius_km / (111.195 * max(np.cos(np.radians(center_lat)), 0.01))
+    return center_lat - dlat, center_lat + dlat, center_lng - dlng, center_lng + dlng
+
+def cell_xy(lat, lng):
+    """Web Mercator tile of a point at CELL_ZOOM (same formula as the grid columns)."""
+    lat_r = np.radians(min(max(lat, -MERCATOR_MAX_LAT), MERCATOR_MAX_LAT))
+    x = int((lng + 180) / 360 * CELL_COUNT)
+    y = int((1 - np.log(np.tan(lat_r) + 1 / np.cos(lat_r)) / np.pi) / 2 * CELL_COUNT)
+    return x, y
+
+def radius_cell_ranges(min_lat, max_lat, min_lng, max_lng):
+    """Key ranges of the cells covering a bounding box: one contiguous range per cell column."""
+    x0, y0 = cell_xy(max_lat, min_lng)  # North-west corner (smallest y)
+    x1, y1 = cell_xy(min_lat, max_lng)  # South-east corner
+    return [(x * CELL_COUNT + y0, x * CELL_COUNT + y1) for x in range(x0, x1 + 1)]
+
+def filter_clauses(filters, params):
+    """WHERE clauses for the listing filters (price, sold dates, beds, types); values go into params."""
+    where_clauses = []
+
+    if "min_price" in filters:
+        where_clauses.append("price >= $min_price")
+        params["min_price"] = int(filters["min_price"])
+        
+    if "max_price" in filters:
+        where_clauses.append("price <= $max_price")
+        params["max_price"] = int(filters["max_price"])
+
+    if "sold_start" in filters:
+        where_clauses.append("sold_date >= CAST($sold_start AS DATE)")
+        params["sold_start"] = str(filters["sold_start"])
+
+    if "sold_end" in filters:
+        where_clauses.append("sold_date <= CAST($sold_end AS DATE)")
+        params["sold_end"] = str(filters["sold_end"])
+
+    # IN lists: one bound placeholder per value
+    if filters.get("beds"):
+        names = [f"bed_{i}" for i in range(len(filters["beds"]))]
+        where_clauses.append(f"beds IN ({', '.join('$' + n for n in names)})")
+        params.update({n: float(v) for n, v in zip(names, filters["beds"])})
+
+    if filters.get("ptypes"):
+        names = [f"ptype_{i}" for i in range(len(filters["ptypes"]))]
+        where_clauses.append(f"ptype IN ({', '.join('$' + n for n in names)})")
+        params.update({n: str(v) for n, v in zip(names, filters["ptypes"])})
+
+    return where_clauses
+
+def build_filtered_query(center_lat, center_lng, radius_km, filters, use_cell_index=True):
+    """Returns (sql, params) for /filtered-points. Every value is a bound parameter."""
+    min_lat, max_lat, min_lng, max_lng = radius_bbox(center_lat, center_lng, radius_km)
+    params = {
+        "center_lat": center_lat, "center_lng": center_lng, "radius_km": radius_km,
+        "min_lat": min_lat, "max_lat": max_lat, "min_lng": min_lng, "max_lng": max_lng,
+    }
+
+    cell_where = ""
+    cell_ranges = radius_cell_ranges(min_lat, max_lat, min_lng, max_lng)
+    if use_cell_index and len(cell_ranges) <= MAX_CELL_RANGES:
+        ranges = []
+        for i, (lo, hi) in enumerate(cell_ranges):
+            ranges.append(f"cell BETWEEN $cell_lo_{i} AND $cell_hi_{i}")
+            params[f"cell_lo_{i}"], params[f"cell_hi_{i}"] = lo, hi
+        cell_where = f"({' OR '.join(ranges)}) AND"
+
+    where_clauses = filter_clauses(filters, params)
+    extra_where = "".join(f" AND {clause}" for clause in where_clauses)
+    return FILTERED_POINTS_SQL.format(cell_where=cell_where, extra_where=extra_where), params
+
 @app.route("/filtered-points", methods=["POST"])
 def filtered_points():
     try:
         data = request.get_json()
         center_lat, center_lng = data.get("center", [45.4215, -75.6972]) # Default Ottawa
-        radius_km = data.get("radius_km", 5)
+        center_lat, center_lng = float(center_lat), float(center_lng)
+        radius_km = float(data.get("radius_km", 5))
         filters = data.get("filters", {})
 
         # ---------------- Query Construction ------------------------------
-        where_clauses = ["latitude IS NOT NULL", "longitude IS NOT NULL"]
-        
-        if "min_price" in filters:
-            price = int(filters["min_price"])
-            where_clauses.append(f"try_cast(\"Sold Price\" as INTEGER) >= {price}")
-            
-        if "max_price" in filters:
-            price = int(filters["max_price"])
-            where_clauses.append(f"try_cast(\"Sold Price\" as INTEGER) <= {price}")
-
-        where_str = " AND ".join(where_clauses)
+        query, params = build_filtered_query(center_lat, center_lng, radius_km, filters)
         
-        # 2. Execute Query
-        query = f"""
-            SELECT 
-                latitude, longitude, "Sold Price" as price, 
-                "Sold Date" as sold_date, 
-                "Address" as address, 
-                MLS as mls, 
-                "Number Beds" as beds, 
-                "Number Baths" as baths, 
-                url, 
-                photo_blob, 
-                "Days On Market" as dom,
-                "Sold Price Difference" as price_diff,
-                "Property Type" as ptype
-            FROM properties
-            WHERE {where_str}
-        """
-        
-        # return as Pandas DataFrame
-        df = con.execute(query).fetchdf()
-
-        # ---------------- Python Post-Processing --------------------------
-        
-        # numeric conversion
-        numeric_cols = ["latitude", "longitude", "price", "beds", "baths", "dom", "price_diff"]
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors="coerce")
-
-        # Distance Filter
-        # Simple Haversine
-        def haversine_np(lon1, lat1, lon2, lat2):
-            lon1, lat1, lon2, lat2 = map(np.radians, [lon1, lat1, lon2, lat2])
-            dlon = lon2 - lon1
-            dlat = lat2 - lat1
-            a = np.sin(dlat/2.0)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2.0)**2
-            c = 2 * np.arcsin(np.sqrt(a))
-            km = 6371 * c
-            return km
-
-        if not df.empty:
-            df["distance_km"] = haversine_np(center_lng, center_lat, df["longitude"], df["latitude"])
-            df = df[df["distance_km"] <= radius_km]
-        else:
-            df["distance_km"] = []
-
-        # Additional Filters (Date, etc)
-        df["sold_date"] = pd.to_datetime(df["sold_date"], errors="coerce")
-        
-        if "sold_start" in filters:
-            df = df[df["sold_date"] >= pd.to_datetime(filters["sold_start"])]
-        if "sold_end" in filters:
-            df = df[df["sold_date"] <= pd.to_datetime(filters["sold_end"])]
-        if "beds" in filters and filters["beds"]:
-             df = df[df["beds"].isin(filters["beds"])]
-        if "ptypes" in filters and filters["ptypes"]:
-             df = df[df["ptype"].isin(filters["ptypes"])]
-
-        # Calculations
-        # List Price = Sold - Diff
-        df["list_price"] = df["price"] - df["price_diff"]
-        df["price_diff_pct"] = (df["price_diff"] / df["list_price"]) * 100
-
-        # Construct Image URL
-        if "photo_blob" in df.columns:
-            df["photo"] = df["photo_blob"].apply(
-                lambda x: f"{BASE_IMG_URL}{x}" if pd.notna(x) and x else None
-            )
-        else:
-            df["photo"] = None
+        # 2. Execute Query (only matching rows are materialized)
+        # Own cursor per request: consistent snapshot even while a refresh commits
+        table = fetch_arrow(get_cursor().execute(query, params))
+        df = table.to_pandas()
 
         # ---------------- Response Preparation ----------------------------
         
@@ -292,19 +1035,10 @@ def filtered_points():
             "latitude", "longitude", "price", "sold_date", "address", "mls",
             "beds", "baths", "url", "photo", "dom", "price_diff_pct", "ptype"
         ]
-        # Valid columns only
-        out_cols = [c for c in out_cols if c in df.columns]
-        
-        points_df = df[out_cols].dropna(subset=["latitude", "longitude"])
-        
-        # Clean NaNs for JSON (Must cast to object to hold None)
-        points_df = points_df.astype(object).where(pd.notnull(points_df), None)
-        points = points_df.to_dict(orient="records")
 
         # Summary Stats (By Month)
-        if not df["sold_date"].isna().all():
-            df["month"] = df["sold_date"].dt.to_period("M").astype(str)
-            grouped = df.groupby("month")
+        if not df["sold_month"].isna().all():
+            grouped = df.rename(columns={"sold_month": "month"}).groupby("month")
             by_month = (
                 grouped.size().to_frame("count")
                 .join(grouped["price"].mean().to_frame("avg_price"))
@@ -327,28 +1061,13 @@ def filtered_points():
             "by_month": by_month,
         }
         
-        # Sanitize summary for NaNs as well
-        # Simple helper to sanitize a dict
-        def sanitize(obj):
-            if isinstance(obj, (np.integer, int)):
-                return int(obj)
-            if isinstance(obj, (np.floating, float)):
-                if np.isnan(obj) or np.isinf(obj):
-                    return None
-                return float(obj)
-            if isinstance(obj, dict):
-                return {k: sanitize(v) for k, v in obj.items()}
-            if isinstance(obj, list):
-                return [sanitize(v) for v in obj]
-            return obj
-            
+        # Sanitize summary for NaNs; points are serialized column-wise by Arrow
         summary = sanitize(summary)
-        points = sanitize(points)
 
-        return jsonify({"points": points, "summary": summary})
+        body, mimetype = encode_points(table.select(out_cols), requested_format(), {"summary": summary})
+        return Response(body, mimetype=mimetype)
 
     except Exception as e:
-        import sys
         sys.stderr.write(f"ERROR in filtered_points: {str(e)}\n{traceback.format_exc()}\n")
         return jsonify({"error": str(e)}), 500
 
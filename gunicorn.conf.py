@@ -0,0 +1,9 @@
+import os
+import subprocess
+import sys
+
+# With DATASET_MODE=shared, build the dataset snapshot once in a child process
+# before any worker forks. Workers then attach it read-only (see app/main.py).
+def on_starting(server):
+    if os.getenv("DATASET_MODE") == "shared":
+        subprocess.run([sys.executable, "-m", "app.build_snapshot"], check=False)
@@ -1,6 +1,43 @@
 /************** 0. GLOBAL CONSTANTS **************/
+// Columnar point payloads ({format: "columns", count, points: {field: [...]}})
+// stay columnar: numeric fields become typed arrays (NaN for null), and a row
+// object is only built for a listing that is actually rendered.
+const NUMERIC_FIELDS = ["latitude", "longitude", "price", "beds", "baths", "dom", "price_diff", "price_diff_pct", "list_price"];
+
+class PointColumns {
+  constructor(data) {
+    if (data.format !== "columns") throw new Error(data.error || "Expected a columnar points payload");
+    this.count = data.count;
+    this.cols = {};
+    for (const [field, values] of Object.entries(data.points)) {
+      this.cols[field] = NUMERIC_FIELDS.includes(field) ? Float64Array.from(values, v => v ?? NaN) : values;
+    }
+    const empty = new Float64Array(0);
+    this.lat = this.cols.latitude || empty;
+    this.lng = this.cols.longitude || empty;
+    this.price = this.cols.price || empty;
+  }
+
+  static empty() {
+    return new PointColumns({ format: "columns", count: 0, points: {} });
+  }
+
+  row(i) {
+    const row = {};
+    for (const field in this.cols) {
+      const v = this.cols[field][i];
+      row[field] = typeof v === "number" && isNaN(v) ? null : v;
+    }
+    return row;
+  }
+
+  locationKey(i) {
+    return `${this.lat[i].toFixed(7)},${this.lng[i].toFixed(7)}`;
+  }
+}
+
 const sortSelect = document.getElementById("sortSelect");
-let currentPoints = [];   // cache the last fetch so we can re-sort on demand
+let currentPoints = PointColumns.empty();   // cache the last fetch so we can re-sort on demand
 sortSelect.addEventListener("change", () => {
   updateListingsSidebar(currentPoints);
 });
@@ -77,82 +114,73 @@ L.tileLayer("https://tile.openstreetmap.org/{z}/{x}/{y}.png", {
 }).addTo(map);
 
 
-/************** 2. MARKER CLUSTERING **************/
-const redDotIcon = L.divIcon({
-  className: "red-dot",
-  iconSize: [14, 14],
-  iconAnchor: [7, 7]
-});
-
-const markersCluster = L.markerClusterGroup({
-  showCoverageOnHover: false,
-  maxClusterRadius: 30,
-  disableClusteringAtZoom: 15,
-  spiderfyOnMaxZoom: true,
-  removeOutsideVisibleBounds: true,
-  animate: true,
-  iconCreateFunction: function (cluster) {
-    const count = cluster.getChildCount();
-    return L.divIcon({
-      html: `<div class="cluster-label">${count} listings</div>`,
-      className: 'cluster-marker',
-      iconSize: [80, 24],
-      iconAnchor: [40, 12]
-    });
-  }
-});
-
-const markers = [];
-const locationMarkersMap = new Map(); // Map "lat,lng" to marker
-
-fetch("/points.json")
-  .then(r => r.json())
-  .then(data => {
-    // Support both {points: [...], date_range: {...}} and flat array
-    const points = data.points || data;
-
-    // Update date slider with actual data range
-    if (data.date_range && data.date_range.min_date) {
-      dateOrigin = new Date(data.date_range.min_date);
-      const maxDate = data.date_range.max_date ? new Date(data.date_range.max_date) : new Date();
-      totalDays = Math.floor((maxDate - dateOrigin) / msPerDay);
-      slider.noUiSlider.updateOptions({
-        range: { min: 0, max: totalDays },
-        start: [0, totalDays]
-      });
-      updateDateLabels();
-    }
+/************** 2. VIEWPORT MARKERS **************/
+// The server answers /map-points with what the viewport can show: one cluster per
+// grid cell when zoomed out, listings once zoomed in (CLUSTER_MAX_ZOOM in app/main.py).
+const viewportLayer = L.layerGroup().addTo(map);
+let mapPointsController = null;
+let initialLoadDone = false;
+
+// Update date slider with the dataset's actual range
+function applyDateRange(dateRange) {
+  if (!dateRange || !dateRange.min_date) return;
+  dateOrigin = new Date(dateRange.min_date);
+  const maxDate = dateRange.max_date ? new Date(dateRange.max_date) : new Date();
+  totalDays = Math.floor((maxDate - dateOrigin) / msPerDay);
+  slider.noUiSlider.updateOptions({
+    range: { min: 0, max: totalDays },
+    start: [0, totalDays]
+  });
+  updateDateLabels();
+}
 
-    // Group properties by coordinates to create one marker per unique location
-    const locationGroups = new Map();
-    points.forEach((point) => {
-      const lat = point.latitude;
-      const lng = point.longitude;
-      if (!isNaN(lat) && !isNaN(lng)) {
-        const key = `${lat.toFixed(7)},${lng.toFixed(7)}`;
-        if (!locationGroups.has(key)) {
-          locationGroups.set(key, []);
-        }
-        locationGroups.get(key).push(point);
-      }
-    });
+// Viewport, zoom and the sidebar's filters as /map-points query parameters
+function mapPointsParams() {
+  const bounds = map.getBounds();
+  const params = new URLSearchParams({
+    bbox: [bounds.getWest(), bounds.getSouth(), bounds.getEast(), bounds.getNorth()]
+      .map(v => v.toFixed(6)).join(","),
+    zoom: map.getZoom(),
+    format: "columns",
+  });
+  const { center, radius_km, filters } = currentFilterPayload();
+  params.set("center", center.join(","));
+  params.set("radius_km", radius_km);
+  Object.entries(filters).forEach(([key, value]) => {
+    if (Array.isArray(value)) value.forEach(v => params.append(key, v));
+    else params.set(key, value);
+  });
+  return params;
+}
 
-    // Create one marker per unique location
-    locationGroups.forEach((group, key) => {
-      const point = group[0];
-      const marker = L.marker([point.latitude, point.longitude], { icon: redDotIcon });
-      marker._locationKey = key;
+async function fetchMapPoints() {
+  // Only the latest viewport matters; drop the request for the previous one
+  if (mapPointsController) mapPointsController.abort();
+  const controller = new AbortController();
+  mapPointsController = controller;
 
-      markersCluster.addLayer(marker);
-      markers.push(marker);
-      locationMarkersMap.set(key, marker);
-    });
+  try {
+    const res = await fetch(`/map-points?${mapPointsParams()}`, { signal: controller.signal });
+    const data = await res.json();
+    if (!initialLoadDone) {
+      // First response: the slider's default range was a guess, so load list and map with the real one
+      initialLoadDone = true;
+      applyDateRange(data.date_range);
+      fetchFilteredPoints();
+      return;
+    }
+    if (data.mode === "clusters") {
+      renderClusters(data.clusters);
+    } else {
+      renderListingMarkers(new PointColumns(data));
+    }
+  } catch (err) {
+    if (err.name !== "AbortError") console.error("Failed to fetch map points:", err);
+  }
+}
 
-    map.addLayer(markersCluster);
-    updateListingsCount();
-    fetchFilteredPoints();
-  })
-  .catch(console.error);
+// moveend also fires at the end of every zoom
+map.on("moveend", fetchMapPoints);
 
 
 /************** 3. CIRCLE AND DRAGGABLE HANDLE **************/
@@ -288,7 +316,8 @@ function highlightSidebarListing(mls) {
   let row = document.getElementById(`listing-${mls}`);
   if (!row) {
     // Listing is on a different page - find which page it's on
-    const idx = getSortedList().findIndex(pt => pt.mls === mls);
+    const mlsCol = currentPoints.cols.mls || [];
+    const idx = listIndices(currentPoints, sortSelect.value).findIndex(i => mlsCol[i] === mls);
     if (idx === -1) return;
     const targetPage = Math.floor(idx / ITEMS_PER_PAGE) + 1;
     currentPage = targetPage;
@@ -303,27 +332,49 @@ function highlightSidebarListing(mls) {
   row.scrollIntoView({ block: "center", behavior: "smooth" });
 }
 
-// Helper: returns the current sorted (and optionally filtered) list
-function getSortedList() {
-  let list = currentPoints.slice();
+// Indices of `points` for a listings view: location selection, search, then the chosen sort
+function listIndices(points, sortValue) {
+  let list = Array.from({ length: points.count }, (_, i) => i);
+
+  // If a location is selected, filter to only those listings
   if (selectedLocationKey) {
-    list = list.filter(pt => {
-      const key = `${Number(pt.latitude).toFixed(7)},${Number(pt.longitude).toFixed(7)}`;
-      return key === selectedLocationKey;
+    list = list.filter(i => points.locationKey(i) === selectedLocationKey);
+  }
+
+  // Search filter
+  if (searchQuery) {
+    const address = points.cols.address || [];
+    list = list.filter(i => {
+      const addr = (address[i] || "").toLowerCase();
+      const price = `$${Math.trunc(points.price[i]).toLocaleString()}`;
+      return addr.includes(searchQuery) || price.includes(searchQuery);
     });
   }
-  switch (sortSelect.value) {
-    case 'asc-price': list.sort((a, b) => a.price - b.price); break;
-    case 'desc-price': list.sort((a, b) => b.price - a.price); break;
-    case 'newest': list.sort((a, b) => new Date(b.sold_date) - new Date(a.sold_date)); break;
-    case 'oldest': list.sort((a, b) => new Date(a.sold_date) - new Date(b.sold_date)); break;
-    default:
+
+  // Sort keys are computed once per listing, not per comparison
+  const price = points.price;
+  switch (sortValue) {
+    case 'asc-price':
+      list.sort((a, b) => (price[a] || 0) - (price[b] || 0));
+      break;
+    case 'desc-price':
+      list.sort((a, b) => (price[b] || 0) - (price[a] || 0));
+      break;
+    case 'newest':
+    case 'oldest': {
+      const dates = points.cols.sold_date || [];
+      const soldAt = new Float64Array(points.count);
+      list.forEach(i => { soldAt[i] = new Date(dates[i]).getTime(); });
+      const dir = sortValue === 'newest' ? -1 : 1;
+      list.sort((a, b) => dir * (soldAt[a] - soldAt[b]));
+      break;
+    }
+    default: {
       const center = circle.getLatLng();
-      list.sort((a, b) => {
-        const da = center.distanceTo(L.latLng(a.latitude, a.longitude));
-        const db = center.distanceTo(L.latLng(b.latitude, b.longitude));
-        return da - db;
-      });
+      const distance = new Float64Array(points.count);
+      list.forEach(i => { distance[i] = center.distanceTo([points.lat[i], points.lng[i]]); });
+      list.sort((a, b) => distance[a] - distance[b]);
+    }
   }
   return list;
 }
@@ -452,54 +503,14 @@ function getPageNumbers(current, total) {
 }
 
 function updateListingsSidebar(points) {
-  let list = points.slice();
-
-  // If a location is selected, filter to only those listings
-  if (selectedLocationKey) {
-    list = list.filter(pt => {
-      const key = `${Number(pt.latitude).toFixed(7)},${Number(pt.longitude).toFixed(7)}`;
-      return key === selectedLocationKey;
-    });
-  }
-
-  // Search filter
-  if (searchQuery) {
-    list = list.filter(pt => {
-      const addr = (pt.address || "").toLowerCase();
-      const price = `$${parseInt(pt.price).toLocaleString()}`;
-      return addr.includes(searchQuery) || price.includes(searchQuery);
-    });
-  }
-
-  // sort
-  switch (sortSelect.value) {
-    case 'asc-price':
-      list.sort((a, b) => a.price - b.price);
-      break;
-    case 'desc-price':
-      list.sort((a, b) => b.price - a.price);
-      break;
-    case 'newest':
-      list.sort((a, b) => new Date(b.sold_date) - new Date(a.sold_date));
-      break;
-    case 'oldest':
-      list.sort((a, b) => new Date(a.sold_date) - new Date(b.sold_date));
-      break;
-    default:
-      const center = circle.getLatLng();
-      list.sort((a, b) => {
-        const da = center.distanceTo(L.latLng(a.latitude, a.longitude));
-        const db = center.distanceTo(L.latLng(b.latitude, b.longitude));
-        return da - db;
-      });
-  }
+  const list = listIndices(points, sortSelect.value);
 
   // Pagination
   const totalItems = list.length;
   const totalPages = Math.ceil(totalItems / ITEMS_PER_PAGE);
   if (currentPage > totalPages) currentPage = 1;
   const startIdx = (currentPage - 1) * ITEMS_PER_PAGE;
-  const pageItems = list.slice(startIdx, startIdx + ITEMS_PER_PAGE);
+  const pageItems = list.slice(startIdx, startIdx + ITEMS_PER_PAGE).map(i => points.row(i));
 
   // Render listings
   const container = document.getElementById("listingRows");
@@ -620,7 +631,8 @@ priceSlider.noUiSlider.on("update", (values) => {
 });
 priceSlider.noUiSlider.on("change", () => fetchFilteredPoints());
 
-async function fetchFilteredPoints() {
+// The radius and sidebar filters, shared by /filtered-points and /map-points
+function currentFilterPayload() {
   const center = circle.getLatLng();
   const radius_km = circle.getRadius() / 1000;
 
@@ -638,22 +650,28 @@ async function fetchFilteredPoints() {
   if (selectedBeds.length) filters.beds = selectedBeds;
   if (selectedPTypes.length) filters.ptypes = selectedPTypes;
 
-  const payload = {
+  return {
     center: [center.lat, center.lng],
     radius_km,
     filters
   };
+}
+
+async function fetchFilteredPoints() {
+  const payload = currentFilterPayload();
+  fetchMapPoints(); // Map markers follow the same filters
 
   try {
-    const res = await fetch("/filtered-points", {
+    const res = await fetch("/filtered-points?format=columns", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify(payload),
     });
-    const { points, summary } = await res.json();
+    const data = await res.json();
+    const points = new PointColumns(data);
+    const summary = data.summary;
     console.log("DEBUG: Received Summary:", summary);
 
-    updateMapMarkers(points); // Update markers with filtered points
     updateStats(summary, points); // Pass points to calculate detailed stats client-side
     currentPoints = points;
     currentPage = 1; // Reset to page 1 on new data
@@ -667,118 +685,128 @@ async function fetchFilteredPoints() {
   }
 }
 
+// Initial load: the first /map-points response sets the date range, then loads the list
+fetchMapPoints();
+
 
 /************** 6. MAP & UI UPDATES **************/
-function updateMapMarkers(filteredPoints) {
-  // Clear all markers from cluster and re-add only filtered ones
-  markersCluster.clearLayers();
-
-  // Group filtered points by location (same logic as marker creation)
-  const filteredByLocation = new Map();
-  filteredPoints.forEach(pt => {
-    if (pt.latitude != null && pt.longitude != null) {
-      const key = `${Number(pt.latitude).toFixed(7)},${Number(pt.longitude).toFixed(7)}`;
-      if (!filteredByLocation.has(key)) {
-        filteredByLocation.set(key, []);
-      }
-      filteredByLocation.get(key).push(pt);
-    }
+function formatPriceLabel(price) {
+  if (price >= 1000000) return `$${(price / 1000000).toFixed(1)}M`;
+  return `$${Math.round(price / 1000)}K`;
+}
+
+function markerIcon(className, labelClass, text) {
+  return L.divIcon({
+    className: className,
+    html: `<div class="${labelClass}">${text}</div>`,
+    iconSize: [80, 24],
+    iconAnchor: [40, 12]
   });
+}
 
-  // Match markers to filtered location groups
-  markers.forEach((marker) => {
-    const key = marker._locationKey;
-    const propertiesHere = filteredByLocation.get(key);
-
-    if (propertiesHere && propertiesHere.length > 0) {
-      const count = propertiesHere.length;
-      const firstProperty = propertiesHere[0];
-
-      // Create custom icon with price label or count badge
-      let iconHTML;
-      let className;
-
-      if (count === 1 && firstProperty.price) {
-        // Single property - show price label
-        const price = firstProperty.price;
-        let formattedPrice;
-        if (price >= 1000000) {
-          formattedPrice = `$${(price / 1000000).toFixed(1)}M`;
-        } else {
-          formattedPrice = `$${Math.round(price / 1000)}K`;
-        }
-        className = "price-marker";
-        iconHTML = `
-          <div class="price-label">${formattedPrice}</div>
-        `;
-      } else {
-        // Multiple properties - show count badge
-        className = "count-marker";
-        iconHTML = `
-          <div class="count-label">${count} listings</div>
-        `;
-      }
+// Single listing: clear any active selection, show the listings and highlight it
+function showListing(mls) {
+  if (selectedMarkerRef) {
+    const prevEl = selectedMarkerRef.getElement();
+    if (prevEl) prevEl.classList.remove("marker-selected");
+  }
+  selectedLocationKey = null;
+  selectedMarkerRef = null;
+  currentPage = 1;
 
-      // Update marker icon
-      const newIcon = L.divIcon({
-        className: className,
-        html: iconHTML,
-        iconSize: [80, 24],
-        iconAnchor: [40, 12]
-      });
+  // Switch to listings if needed
+  if (currentView === "insights") {
+    toggleView();
+  }
+
+  // Re-render full listings then highlight clicked one
+  updateListingsSidebar(currentPoints);
+  if (mls) {
+    setTimeout(() => highlightSidebarListing(mls), 150);
+  }
+}
 
-      marker.setIcon(newIcon);
-      markersCluster.addLayer(marker);
+// Zoomed out: one marker per server-side cluster; clicking a group zooms in on it
+function renderClusters(clusters) {
+  viewportLayer.clearLayers();
+  clusters.forEach(cluster => {
+    const single = cluster.count === 1 && cluster.avg_price;
+    const icon = single
+      ? markerIcon("price-marker", "price-label", formatPriceLabel(cluster.avg_price))
+      : markerIcon("cluster-marker", "cluster-label", `${cluster.count} listings`);
+    const marker = L.marker([cluster.latitude, cluster.longitude], { icon });
+    marker.on("click", (e) => {
+      L.DomEvent.stopPropagation(e); // Prevent map click from clearing selection
+      if (single) {
+        showListing(cluster.mls);
+      } else {
+        map.setView([cluster.latitude, cluster.longitude], Math.min(map.getZoom() + 2, map.getMaxZoom()));
+      }
+    });
+    viewportLayer.addLayer(marker);
+  });
+}
 
-      // Update click handler
-      marker.off('click');
-      marker.on("click", (e) => {
-        L.DomEvent.stopPropagation(e); // Prevent map click from clearing selection
+// Zoomed in: one marker per unique location, with a price label or a count badge
+function renderListingMarkers(points) {
+  viewportLayer.clearLayers();
+  selectedMarkerRef = null;
+
+  const byLocation = new Map();
+  for (let i = 0; i < points.count; i++) {
+    if (isNaN(points.lat[i]) || isNaN(points.lng[i])) continue;
+    const key = points.locationKey(i);
+    if (!byLocation.has(key)) {
+      byLocation.set(key, []);
+    }
+    byLocation.get(key).push(i);
+  }
 
-        if (count > 1) {
-          // Multi-listing: select this location and filter sidebar
-          // Clear previous selection
-          if (selectedMarkerRef) {
-            const prevEl = selectedMarkerRef.getElement();
-            if (prevEl) prevEl.classList.remove("marker-selected");
-          }
+  const mlsCol = points.cols.mls || [];
+  byLocation.forEach((indices, key) => {
+    const count = indices.length;
+    const first = indices[0];
+    const icon = count === 1 && points.price[first]
+      ? markerIcon("price-marker", "price-label", formatPriceLabel(points.price[first]))
+      : markerIcon("count-marker", "count-label", `${count} listings`);
+    const marker = L.marker([points.lat[first], points.lng[first]], { icon });
+    viewportLayer.addLayer(marker);
+
+    // Keep the selected location highlighted across viewport refreshes
+    if (key === selectedLocationKey) {
+      selectedMarkerRef = marker;
+      const el = marker.getElement();
+      if (el) el.classList.add("marker-selected");
+    }
 
-          selectedLocationKey = key;
-          selectedMarkerRef = marker;
+    marker.on("click", (e) => {
+      L.DomEvent.stopPropagation(e); // Prevent map click from clearing selection
 
-          // Add selected styling
-          const el = marker.getElement();
-          if (el) el.classList.add("marker-selected");
+      if (count > 1) {
+        // Multi-listing: select this location and filter sidebar
+        // Clear previous selection
+        if (selectedMarkerRef) {
+          const prevEl = selectedMarkerRef.getElement();
+          if (prevEl) prevEl.classList.remove("marker-selected");
+        }
 
-          // Switch to listings view and show filtered listings
-          if (currentView === "insights") {
-            toggleView();
-          }
-          currentPage = 1;
-          updateListingsSidebar(currentPoints);
-        } else {
-          // Single listing: clear any active selection and restore full view
-          if (selectedMarkerRef) {
-            const prevEl = selectedMarkerRef.getElement();
-            if (prevEl) prevEl.classList.remove("marker-selected");
-          }
-          selectedLocationKey = null;
-          selectedMarkerRef = null;
-          currentPage = 1;
+        selectedLocationKey = key;
+        selectedMarkerRef = marker;
 
-          // Switch to listings if needed
-          if (currentView === "insights") {
-            toggleView();
-          }
+        // Add selected styling
+        const el = marker.getElement();
+        if (el) el.classList.add("marker-selected");
 
-          // Re-render full listings then highlight clicked one
-          updateListingsSidebar(currentPoints);
-          if (firstProperty.mls) {
-            setTimeout(() => highlightSidebarListing(firstProperty.mls), 150);
-          }
+        // Switch to listings view and show filtered listings
+        if (currentView === "insights") {
+          toggleView();
         }
-      });
-    }
+        currentPage = 1;
+        updateListingsSidebar(currentPoints);
+      } else {
+        showListing(mlsCol[first]);
+      }
+    });
   });
 }
 
@@ -818,27 +846,30 @@ function updateStats(summary, points) {
   let clientAvgDom = null;
   let clientAvgDiff = null;
 
-  if (points && points.length > 0) {
+  if (points && points.count > 0) {
     let domSum = 0;
     let domCount = 0;
     let diffSum = 0;
     let diffCount = 0;
 
-    points.forEach(pt => {
-      if (pt.dom !== null && pt.dom !== undefined && !isNaN(pt.dom)) {
-        domSum += pt.dom;
+    // Nulls are NaN in the typed columns
+    const dom = points.cols.dom || [];
+    const diffPct = points.cols.price_diff_pct || [];
+    for (let i = 0; i < points.count; i++) {
+      if (!isNaN(dom[i])) {
+        domSum += dom[i];
         domCount++;
       }
-      if (pt.price_diff_pct !== null && pt.price_diff_pct !== undefined && !isNaN(pt.price_diff_pct)) {
-        diffSum += pt.price_diff_pct;
+      if (!isNaN(diffPct[i])) {
+        diffSum += diffPct[i];
         diffCount++;
       }
-    });
+    }
 
     if (domCount > 0) clientAvgDom = domSum / domCount;
     if (diffCount > 0) clientAvgDiff = diffSum / diffCount;
 
-    console.log(`DEBUG Client Calc: DOM=${clientAvgDom}, Diff=${clientAvgDiff}, Count=${points.length}`);
+    console.log(`DEBUG Client Calc: DOM=${clientAvgDom}, Diff=${clientAvgDiff}, Count=${points.count}`);
   }
 
   const { count, average_price, max_price, min_price, by_month } = summary;
@@ -984,16 +1015,6 @@ function updateStats(summary, points) {
   }
 }
 
-function updateListingsCount() {
-  const circleCenter = circle.getLatLng();
-  const circleRadius = circle.getRadius();
-  let count = 0;
-  markers.forEach(marker => {
-    if (circleCenter.distanceTo(marker.getLatLng()) <= circleRadius) count++;
-  });
-  console.log(`Listings within circle: ${count}`);
-}
-
 // ═══════════════════════════════════════════════════════════
 // TIME UTILITIES
 // ═══════════════════════════════════════════════════════════
@@ -1072,40 +1093,8 @@ function offsetToDateStr(offset) {
   function renderMobileListings() {
     if (!mobileListingRows) return;
 
-    let list = currentPoints.slice();
-
-    // If a location is selected, filter
-    if (selectedLocationKey) {
-      list = list.filter(pt => {
-        const key = `${Number(pt.latitude).toFixed(7)},${Number(pt.longitude).toFixed(7)}`;
-        return key === selectedLocationKey;
-      });
-    }
-
-    // Search filter (uses shared searchQuery variable)
-    if (searchQuery) {
-      list = list.filter(pt => {
-        const addr = (pt.address || "").toLowerCase();
-        const price = `$${parseInt(pt.price).toLocaleString()}`;
-        return addr.includes(searchQuery) || price.includes(searchQuery);
-      });
-    }
-
     // Sort using mobile sort select
-    const sortVal = mobileSortSelect ? mobileSortSelect.value : "newest";
-    switch (sortVal) {
-      case 'asc-price': list.sort((a, b) => a.price - b.price); break;
-      case 'desc-price': list.sort((a, b) => b.price - a.price); break;
-      case 'newest': list.sort((a, b) => new Date(b.sold_date) - new Date(a.sold_date)); break;
-      case 'oldest': list.sort((a, b) => new Date(a.sold_date) - new Date(b.sold_date)); break;
-      default:
-        const center = circle.getLatLng();
-        list.sort((a, b) => {
-          const da = center.distanceTo(L.latLng(a.latitude, a.longitude));
-          const db = center.distanceTo(L.latLng(b.latitude, b.longitude));
-          return da - db;
-        });
-    }
+    const list = listIndices(currentPoints, mobileSortSelect ? mobileSortSelect.value : "newest");
 
     // Pagination
     const MOBILE_PER_PAGE = 20;
@@ -1114,7 +1103,7 @@ function offsetToDateStr(offset) {
     if (window._mobileCurrentPage > totalPages) window._mobileCurrentPage = 1;
     if (!window._mobileCurrentPage) window._mobileCurrentPage = 1;
     const startIdx = (window._mobileCurrentPage - 1) * MOBILE_PER_PAGE;
-    const pageItems = list.slice(startIdx, startIdx + MOBILE_PER_PAGE);
+    const pageItems = list.slice(startIdx, startIdx + MOBILE_PER_PAGE).map(i => currentPoints.row(i));
 
     mobileListingRows.innerHTML = "";
 